@@ -31,7 +31,7 @@ def test_dashboard_for_student(username):
         return
     
     # Simulate the dashboard_detail view logic
-    from maths.views import calculate_age_from_dob, get_or_create_age_level, get_or_create_formatted_topic
+    from maths.buckets import calculate_age_from_dob, get_or_create_age_level, get_or_create_formatted_topic
     
     # Get all student answers
     student_answers = StudentAnswer.objects.filter(
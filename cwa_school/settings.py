@@ -117,3 +117,24 @@ else:
 
 # Optional: how long reset links are valid (seconds)
 PASSWORD_RESET_TIMEOUT = int(os.getenv("PASSWORD_RESET_TIMEOUT", "3600"))
+
+# Background job queue (topic statistics updates). Keep a single worker on
+# SQLite so jobs don't compete for the database lock.
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "1"))
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", "100"))
+
+# TimeLog rows are copied from the daily activity rollup at most once per
+# this many seconds per process (0 syncs after every attempt)
+TIME_LOG_SYNC_INTERVAL = int(os.getenv("TIME_LOG_SYNC_INTERVAL", "60"))
+
+# Cache used for shared version counters (e.g. topic statistics colours).
+# The default local-memory cache is per process; point CACHE_BACKEND at a
+# shared backend (file-based, database or Redis) when running several
+# workers so they all see invalidations, including those made by management
+# commands such as recompute_topic_statistics (which warn otherwise).
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
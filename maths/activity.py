@@ -0,0 +1,115 @@
+"""
+Per-student activity watermark for conditional GETs.
+
+Each student has a watermark in Django's cache (milliseconds since the
+epoch) that moves forward whenever something their pages show is written:
+answers, final answers, Basic Facts results, enrolments and profile saves
+(see maths.signals). Views wrapped with django.views.decorators.http.condition
+use the etag/last-modified functions below, so a browser revalidating an
+unchanged page gets a 304 after a couple of cache reads and no ORM work.
+
+Functions return None for teachers, whose pages aren't keyed on a student's
+activity; condition() then serves the view normally. The watermark also
+stamps the cached time totals (get_time_totals).
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import catalog, statistics_cache
+
+
+def _key(student_id):
+    return f'maths:activity:{student_id}'
+
+
+def touch(student_id):
+    """Move a student's watermark forward (called after their data changes)"""
+    key = _key(student_id)
+    now = int(time.time() * 1000)
+    # Never reuse a value, even for two writes in the same millisecond
+    cache.set(key, max(now, (cache.get(key) or 0) + 1), timeout=None)
+
+
+def get_watermark(student_id):
+    """Student's watermark, starting it from now if the cache has none"""
+    key = _key(student_id)
+    watermark = cache.get(key)
+    if watermark is None:
+        # Unknown history: treat the data as just changed
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        watermark = cache.get(key)
+    return watermark
+
+
+def get_time_totals(student):
+    """
+    Student's (daily, weekly) seconds from the daily activity rollup, cached
+    until their watermark moves or the local day changes.
+    """
+    from .models import StudentDailyActivity
+
+    key = f'maths:time_totals:{student.pk}'
+    # Read the stamp before the totals, so a write during the query leaves the entry stale
+    stamp = (get_watermark(student.pk), timezone.localdate().isoformat())
+    cached = cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    totals = StudentDailyActivity.time_totals(student)
+    cache.set(key, (stamp, totals), timeout=24 * 60 * 60)
+    return totals
+
+
+def _student(request):
+    user = request.user
+    if not user.is_authenticated or user.is_teacher:
+        return None
+    return user
+
+
+def _watermark_datetime(student):
+    return datetime.fromtimestamp(get_watermark(student.pk) / 1000, tz=dt_timezone.utc)
+
+
+def _etag(student, *parts):
+    # last_login changes on every login, which also rotates the CSRF token
+    # embedded in rendered pages
+    last_login = int(student.last_login.timestamp()) if student.last_login else 0
+    return '-'.join(str(part) for part in (student.pk, last_login, get_watermark(student.pk), *parts))
+
+
+def last_modified(request, *args, **kwargs):
+    """Last-Modified for a student's pages: their watermark"""
+    student = _student(request)
+    return _watermark_datetime(student) if student else None
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag for pages built from the student's data and the level catalog"""
+    student = _student(request)
+    return _etag(student, catalog.get_version()) if student else None
+
+
+def progress_etag(request, *args, **kwargs):
+    """ETag for progress data, whose colour bands also follow the topic statistics"""
+    student = _student(request)
+    if not student:
+        return None
+    return _etag(student, catalog.get_version(), statistics_cache.get_version(), request.GET.urlencode())
+
+
+def time_log_last_modified(request, *args, **kwargs):
+    """Last-Modified for the time log: daily and weekly totals also reset at local midnight"""
+    student = _student(request)
+    if not student:
+        return None
+    day_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(_watermark_datetime(student), day_start)
+
+
+def time_log_etag(request, *args, **kwargs):
+    """ETag for the time log, which changes with activity and with the local date"""
+    student = _student(request)
+    return _etag(student, timezone.localdate().isoformat()) if student else None
@@ -1,6 +1,6 @@
 ﻿from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Topic, Level, ClassRoom, Enrollment, BasicFactsResult, TimeLog, Question, Answer
+from .models import CustomUser, Topic, Level, ClassRoom, Enrollment, BasicFactsResult, TimeLog, Question, Answer, StudentDailyActivity
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -26,6 +26,13 @@ class TimeLogAdmin(admin.ModelAdmin):
     search_fields = ("student__username",)
     readonly_fields = ("last_reset_date", "last_activity")
 
+@admin.register(StudentDailyActivity)
+class StudentDailyActivityAdmin(admin.ModelAdmin):
+    list_display = ("student", "date", "seconds", "attempts", "points")
+    list_filter = ("date",)
+    search_fields = ("student__username",)
+    ordering = ("-date",)
+
 class AnswerInline(admin.TabularInline):
     model = Answer
     extra = 1
@@ -0,0 +1,79 @@
+"""
+Per-process answer keys for grading topic quiz answers.
+
+An answer key holds what grading a question needs: its level, topic name,
+type, points, explanation, correct answers and the ids of all its answers.
+Keys are stored when a quiz is served (kept with each question's cached
+payload, see maths.question_payloads), so checking an answer reads nothing
+from the database. Question and Answer signals in maths.signals bump a version
+counter in Django's cache; each process drops its keys when the counter no
+longer matches what it loaded. Keys missing from the map are loaded in one
+query per batch.
+"""
+import threading
+
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = 'maths:answer_keys:version'
+_version = VersionedCache(VERSION_KEY)
+get_version = _version.get_version
+invalidate = _version.invalidate
+
+_lock = threading.Lock()
+_keys = {}  # {question_id: answer key dict}
+_loaded_version = None
+
+
+def build_key(question):
+    """Answer key for a question with its topic and answers loaded"""
+    answers = list(question.answers.all())
+    correct = next((answer for answer in answers if answer.is_correct), None)
+    return {
+        'level_id': question.level_id,
+        'topic_name': question.topic.name if question.topic_id else '',
+        'question_type': question.question_type,
+        'points': question.points,
+        'explanation': question.explanation or '',
+        # Any correct answer scores; the first is the one shown to the student
+        'correct_answer_ids': frozenset(answer.id for answer in answers if answer.is_correct),
+        'correct_answer_id': correct.id if correct else None,
+        'correct_answer_text': correct.answer_text if correct else '',
+        'answer_ids': frozenset(answer.id for answer in answers),
+    }
+
+
+def remember_keys(keys, version):
+    """
+    Store {question_id: answer key}. version is get_version() read before
+    the data the keys were built from was loaded, so an edit committed in
+    between isn't cached.
+    """
+    global _keys, _loaded_version
+
+    with _lock:
+        if _loaded_version != version:
+            if version != get_version():
+                return  # Loaded before an edit; don't keep it
+            _keys = {}
+            _loaded_version = version
+        _keys.update(keys)
+
+
+def get_answer_keys(question_ids):
+    """{question_id: answer key} for the questions that exist, loading any missing keys"""
+    from .models import Question
+
+    version = get_version()
+    with _lock:
+        keys = _keys if _loaded_version == version else {}
+        found = {question_id: keys[question_id] for question_id in question_ids if question_id in keys}
+
+    missing = set(question_ids) - set(found)
+    if missing:
+        loaded = {
+            question.id: build_key(question)
+            for question in Question.objects.filter(id__in=missing).select_related('topic').prefetch_related('answers')
+        }
+        remember_keys(loaded, version)
+        found.update(loaded)
+    return found
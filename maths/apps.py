@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MathsConfig(AppConfig):
+    name = "maths"
+
+    def ready(self):
+        # Connect cache invalidation signal handlers
+        from . import signals  # noqa: F401
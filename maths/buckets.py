@@ -0,0 +1,147 @@
+"""
+Age and Basic Facts bucket resolution for topic statistics.
+
+Basic Facts statistics are grouped by the student's age: the statistics level
+is Level(level_number=2000 + age) and the topic is
+Topic(name="{level_number}_{topic_name}"), e.g. "100_Addition".
+
+The bucket id maps are loaded once per process and shared across requests,
+so resolving a bucket does not issue a query. They are cleared by the Level
+and Topic signals in maths.signals when bucket changes commit, so a bucket
+created in a transaction that rolls back is never cached. Buckets created by
+another process (the recompute_topic_statistics command) aren't signalled
+here, so a lookup that misses reloads maps older than MISS_RELOAD_SECONDS,
+which bounds the cost of buckets that don't exist yet.
+"""
+import re
+import threading
+import time
+from datetime import date
+
+AGE_LEVEL_OFFSET = 2000
+MISS_RELOAD_SECONDS = 60
+
+_FORMATTED_TOPIC_RE = re.compile(r'^[0-9]+_')
+
+_lock = threading.Lock()
+_age_levels = None  # {age: level_id}
+_formatted_topics = None  # {formatted_topic_name: topic_id}
+_loaded_at = None  # time.monotonic() when the maps were loaded
+
+
+def calculate_age_from_dob(date_of_birth):
+    """
+    Calculate age from date of birth (integer years only, ignoring months).
+    For example: 6 years and 4 months -> returns 6
+    """
+    if not date_of_birth:
+        return None
+    today = date.today()
+    # Calculate age in years only (integer, no rounding)
+    # If birthday hasn't occurred this year, subtract 1
+    age = today.year - date_of_birth.year
+    if (today.month, today.day) < (date_of_birth.month, date_of_birth.day):
+        age -= 1
+    return age
+
+
+def format_topic_name(level_number, topic_name):
+    """Basic Facts statistics topic name: {level_number}_{topic_name}"""
+    return f"{level_number}_{topic_name}"
+
+
+def is_age_level_number(level_number):
+    return level_number >= AGE_LEVEL_OFFSET
+
+
+def is_formatted_topic_name(name):
+    return bool(_FORMATTED_TOPIC_RE.match(name or ""))
+
+
+def _load():
+    """Load the bucket id maps if they are not cached; returns them"""
+    global _age_levels, _formatted_topics, _loaded_at
+    from .models import Level, Topic
+
+    with _lock:
+        if _age_levels is None or _formatted_topics is None:
+            _loaded_at = time.monotonic()
+            _age_levels = {
+                level_number - AGE_LEVEL_OFFSET: level_id
+                for level_number, level_id in Level.objects.filter(
+                    level_number__gte=AGE_LEVEL_OFFSET
+                ).values_list('level_number', 'id')
+            }
+            # Topic names are not unique; keep the first (lowest id) match
+            topics = {}
+            for name, topic_id in Topic.objects.filter(
+                name__regex=_FORMATTED_TOPIC_RE.pattern
+            ).order_by('id').values_list('name', 'id'):
+                topics.setdefault(name, topic_id)
+            _formatted_topics = topics
+        return _age_levels, _formatted_topics
+
+
+def invalidate():
+    """Drop the cached bucket maps; they are reloaded on next use"""
+    global _age_levels, _formatted_topics
+    with _lock:
+        _age_levels = None
+        _formatted_topics = None
+
+
+def _reload_after_miss():
+    """Reload the bucket maps after a lookup missed; returns them, or None if they were loaded too recently"""
+    with _lock:
+        if _loaded_at is not None and time.monotonic() - _loaded_at < MISS_RELOAD_SECONDS:
+            return None
+    invalidate()
+    return _load()
+
+
+def get_age_level_id(age, create=False):
+    """Id of the statistics Level for an age, or None if it doesn't exist and create is False"""
+    from .models import Level
+
+    age_levels, _ = _load()
+    level_id = age_levels.get(age)
+    if level_id is None and not create:
+        maps = _reload_after_miss()
+        if maps is not None:
+            level_id = maps[0].get(age)
+    if level_id is None and create:
+        level, created = Level.objects.get_or_create(
+            level_number=AGE_LEVEL_OFFSET + age,
+            defaults={'title': f"Age {age}"}
+        )
+        level_id = level.id  # Cached once the Level signal's invalidation runs on commit
+    return level_id
+
+
+def get_formatted_topic_id(level_number, topic_name, create=False):
+    """Id of the Basic Facts statistics Topic, or None if it doesn't exist and create is False"""
+    from .models import Topic
+
+    formatted_name = format_topic_name(level_number, topic_name)
+    _, formatted_topics = _load()
+    topic_id = formatted_topics.get(formatted_name)
+    if topic_id is None and not create:
+        maps = _reload_after_miss()
+        if maps is not None:
+            topic_id = maps[1].get(formatted_name)
+    if topic_id is None and create:
+        topic, created = Topic.objects.get_or_create(name=formatted_name)
+        topic_id = topic.id  # Cached once the Topic signal's invalidation runs on commit
+    return topic_id
+
+
+def get_or_create_age_level(age):
+    """Get or create a Level object for a specific age (for Basic Facts statistics)"""
+    from .models import Level
+    return Level.objects.get(pk=get_age_level_id(age, create=True))
+
+
+def get_or_create_formatted_topic(level_number, topic_name):
+    """Get or create a Topic with formatted name for Basic Facts: {level_number}_{topic_name}"""
+    from .models import Topic
+    return Topic.objects.get(pk=get_formatted_topic_id(level_number, topic_name, create=True))
@@ -0,0 +1,94 @@
+"""
+Process-wide catalog of levels and their topics for dashboard grouping.
+
+Levels (with their topics prefetched) are loaded once per process and
+shared across requests, so grouping the dashboard by year and Basic Facts
+subtopic issues no queries. The Level, Topic and Level.topics signals in
+maths.signals bump a version counter in Django's cache; each process
+reloads the catalog when the counter no longer matches what it loaded.
+
+The static mappings (BASIC_FACTS_TOPIC_CONFIG, YEAR_TOPICS_MAP) live in
+maths.constants and are re-exported here so grouping code has one import.
+"""
+import threading
+
+from .constants import BASIC_FACTS_SUBTOPICS, BASIC_FACTS_TOPIC_CONFIG, YEAR_TOPICS_MAP  # noqa: F401
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = 'maths:catalog:version'
+_version = VersionedCache(VERSION_KEY)
+get_version = _version.get_version
+invalidate = _version.invalidate
+
+_lock = threading.Lock()
+_catalog = None
+_loaded_version = None
+
+
+def _build():
+    from .models import Level
+
+    levels = list(Level.objects.prefetch_related('topics'))
+    subtopic_names = set(BASIC_FACTS_SUBTOPICS)
+
+    basic_facts_by_subtopic = {}
+    for level in levels:
+        if level.level_number < 100:
+            continue
+        # A level belongs to its first (lowest id) subtopic
+        subtopics = sorted(
+            (topic for topic in level.topics.all() if topic.name in subtopic_names),
+            key=lambda topic: topic.id
+        )
+        if subtopics:
+            basic_facts_by_subtopic.setdefault(subtopics[0].name, []).append(level)
+
+    return {
+        'levels': levels,
+        'levels_by_number': {level.level_number: level for level in levels},
+        'basic_facts_by_subtopic': basic_facts_by_subtopic,
+    }
+
+
+def _get():
+    global _catalog, _loaded_version
+
+    version = get_version()
+    with _lock:
+        if _catalog is None or _loaded_version != version:
+            _catalog = _build()
+            _loaded_version = version
+        return _catalog
+
+
+def get_levels():
+    """All levels ordered by level number, with topics prefetched"""
+    return list(_get()['levels'])
+
+
+def get_level(level_number):
+    """Level with the given number, or None"""
+    return _get()['levels_by_number'].get(level_number)
+
+
+def get_basic_facts_by_subtopic():
+    """Basic Facts levels (>= 100) grouped by subtopic name, sorted by level number"""
+    return {
+        subtopic_name: list(levels)
+        for subtopic_name, levels in _get()['basic_facts_by_subtopic'].items()
+    }
+
+
+def group_year_levels(levels=None):
+    """
+    Year levels (< 100) grouped by year: returns (levels_by_year, sorted_years).
+    levels defaults to every level in the catalog.
+    """
+    if levels is None:
+        levels = _get()['levels']
+    levels_by_year = {}
+    for level in levels:
+        if level.level_number < 100:
+            levels_by_year.setdefault(level.level_number, []).append(level)
+    return levels_by_year, sorted(levels_by_year)
+
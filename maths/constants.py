@@ -1,3 +1,19 @@
+# Number of questions in a full quiz attempt for each year level.
+YEAR_QUESTION_COUNTS = {1: 12, 2: 10, 3: 12, 4: 15, 5: 17, 6: 20, 7: 22, 8: 25, 9: 30}
+
+# Basic Facts subtopics; each Basic Facts level (100+) belongs to exactly one.
+BASIC_FACTS_SUBTOPICS = ['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts']
+
+# Basic Facts level numbers per subtopic slug: levels start_level to
+# start_level + level_count - 1 are shown to students as levels 1..level_count.
+BASIC_FACTS_TOPIC_CONFIG = {
+    "addition": {"start_level": 100, "level_count": 7},
+    "subtraction": {"start_level": 107, "level_count": 7},
+    "multiplication": {"start_level": 114, "level_count": 7},
+    "division": {"start_level": 121, "level_count": 7},
+    "place-value-facts": {"start_level": 128, "level_count": 5},
+}
+
 # Times tables available per year for Multiplication and Division topics.
 # Edit this dict to change which times tables are available for each year.
 # Each times table generates questions up to X * 12.
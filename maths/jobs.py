@@ -0,0 +1,127 @@
+"""
+Small in-process background job queue.
+
+Replaces spawning one daemon thread per request. Jobs are identified by a key;
+submitting a key that is already waiting in the queue is coalesced into the
+queued job, so a burst of identical requests costs a single run.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Bounded worker pool with per-key deduplication.
+
+    Args:
+        max_workers: Number of worker threads
+        max_pending: Maximum number of jobs waiting to run; further
+            submissions are rejected so the caller can handle backpressure
+    """
+
+    def __init__(self, max_workers=1, max_pending=100):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # key -> (func, args, kwargs)
+        self._running = set()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._shutting_down = False
+        self._counters = {
+            'submitted': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'completed': 0,
+            'failed': 0,
+            'total_run_seconds': 0.0,
+            'max_run_seconds': 0.0,
+        }
+
+    def submit(self, key, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) to run in the background under key.
+        Returns True if the job is queued (or coalesced into a queued job with
+        the same key) and False if it was rejected because the queue is full
+        or shutting down.
+        """
+        with self._condition:
+            if self._shutting_down:
+                self._counters['dropped'] += 1
+                return False
+            if key in self._pending:
+                self._counters['coalesced'] += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self._counters['dropped'] += 1
+                return False
+            self._pending[key] = (func, args, kwargs)
+            self._counters['submitted'] += 1
+            self._start_workers()
+            self._condition.notify()
+        return True
+
+    def stats(self):
+        """Return a snapshot of the queue counters"""
+        with self._condition:
+            counters = dict(self._counters)
+            counters['queue_depth'] = len(self._pending)
+            counters['running'] = len(self._running)
+        return counters
+
+    def shutdown(self, timeout=10):
+        """Stop accepting jobs and wait up to timeout seconds for queued jobs to finish"""
+        with self._condition:
+            self._shutting_down = True
+            self._condition.notify_all()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+
+    def _start_workers(self):
+        # Called with the condition held
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name="maths-job-worker", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._shutting_down:
+                    self._condition.wait()
+                if not self._pending:
+                    return  # Shutting down and drained
+                key, (func, args, kwargs) = self._pending.popitem(last=False)
+                self._running.add(key)
+
+            started = time.monotonic()
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Background job %r failed", key)
+                failed = True
+            finally:
+                close_old_connections()
+                elapsed = time.monotonic() - started
+                with self._condition:
+                    self._running.discard(key)
+                    self._counters['failed' if failed else 'completed'] += 1
+                    self._counters['total_run_seconds'] += elapsed
+                    self._counters['max_run_seconds'] = max(self._counters['max_run_seconds'], elapsed)
+
+
+background_jobs = JobQueue(
+    max_workers=getattr(settings, 'JOB_QUEUE_WORKERS', 1),
+    max_pending=getattr(settings, 'JOB_QUEUE_MAX_PENDING', 100),
+)
+atexit.register(background_jobs.shutdown)
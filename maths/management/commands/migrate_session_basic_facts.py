@@ -0,0 +1,199 @@
+"""
+Move legacy Basic Facts results out of stored sessions.
+
+Older versions kept Basic Facts results in the session under
+basic_facts_results_{user_id}_{level_number}. This command walks the
+django_session table in chunks, bulk-inserts any results missing from
+BasicFactsResult (existing attempts are skipped by the unique constraint),
+strips the imported results from the sessions, and rebuilds the affected students' best
+records and daily statistics.
+"""
+import re
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from maths import activity
+from maths.models import BasicFactsResult, CustomUser, Level
+from maths.progress import invalidate_progress_snapshot
+from maths.topic_statistics import rebuild_basic_facts_bests, rebuild_daily_statistics
+from maths.versioned_cache import cache_is_shared
+
+RESULTS_KEY_RE = re.compile(r'^basic_facts_results_(\d+)_(\d+)$')
+
+
+class Command(BaseCommand):
+    help = "Import Basic Facts results stored in sessions into BasicFactsResult and strip them from the sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Sessions processed per transaction")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Report what would be imported without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.db':
+            raise CommandError("Sessions are not stored in the database (SESSION_ENGINE)")
+
+        self.levels = dict(Level.objects.filter(level_number__gte=100).values_list('level_number', 'id'))
+        self.student_ids = set(CustomUser.objects.values_list('id', flat=True))
+        self.dry_run = options['dry_run']
+        self.skipped = 0
+
+        sessions_changed = 0
+        imported = 0
+        affected = set()  # (student_id, level_id)
+        earliest = None
+
+        last_key = ''
+        while True:
+            chunk = list(Session.objects.filter(session_key__gt=last_key).order_by('session_key')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_key = chunk[-1].session_key
+
+            with transaction.atomic():
+                changed, rows = self._process_chunk(chunk)
+                sessions_changed += changed
+                for row in rows:
+                    affected.add((row.student_id, row.level_id))
+                    if earliest is None or row.completed_at < earliest:
+                        earliest = row.completed_at
+                if rows and not self.dry_run:
+                    imported += self._insert(rows)
+                elif rows:
+                    imported += len(rows)
+
+        if affected and not self.dry_run:
+            rebuild_basic_facts_bests(affected)
+            rebuild_daily_statistics(timezone.localdate(earliest))
+            for student_id in {student_id for student_id, _ in affected}:
+                invalidate_progress_snapshot(student_id)
+                activity.touch(student_id)
+
+        verb = "Found" if self.dry_run else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {imported} Basic Facts results from {sessions_changed} sessions"
+        ))
+        if self.skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {self.skipped} results that could not be imported; they were left in their sessions"
+            ))
+        if affected and not self.dry_run and not cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                "CACHES uses a per-process backend, so running web processes keep the affected students' "
+                "cached progress; restart them, or set CACHE_BACKEND to a shared backend"
+            ))
+
+    def _process_chunk(self, chunk):
+        """Collect results from a chunk of sessions and strip the imported ones; returns (sessions changed, rows)"""
+        store = SessionStore()
+        changed = 0
+        rows = []
+        for session in chunk:
+            try:
+                data = session.get_decoded()
+            except Exception:
+                continue  # Corrupt or undecodable session; leave it alone
+
+            keys = [key for key in data if RESULTS_KEY_RE.match(key)]
+            session_changed = False
+            for key in keys:
+                student_id, level_number = (int(part) for part in RESULTS_KEY_RE.match(key).groups())
+                level_id = self.levels.get(level_number)
+                entries = data[key] or []
+                if level_id is None or student_id not in self.student_ids:
+                    self.skipped += len(entries)
+                    continue  # Leave the results in the session
+                left = []
+                for entry in entries:
+                    row = self._result_from_entry(student_id, level_id, entry)
+                    if row:
+                        rows.append(row)
+                    else:
+                        left.append(entry)
+                self.skipped += len(left)
+                if entries and len(left) == len(entries):
+                    continue  # Nothing imported; leave the key as it is
+                # Strip the imported results; any that couldn't be read stay for inspection
+                if left:
+                    data[key] = left
+                else:
+                    del data[key]
+                session_changed = True
+
+            if not session_changed:
+                continue
+            changed += 1
+            if not self.dry_run:
+                Session.objects.filter(pk=session.pk).update(session_data=store.encode(data))
+        return changed, rows
+
+    def _result_from_entry(self, student_id, level_id, entry):
+        """BasicFactsResult for a session entry, or None if it can't be read"""
+        if not isinstance(entry, dict):
+            return None
+        session_id = entry.get('session_id', '')
+        if not session_id:
+            return None
+        try:
+            points = float(entry.get('points') or 0)
+        except (TypeError, ValueError):
+            return None
+        # Fix old format points if needed
+        if points > 100:
+            points = points / 10
+        completed_at = timezone.now()
+        if entry.get('date'):
+            try:
+                completed_at = datetime.fromisoformat(entry['date'])
+            except (ValueError, TypeError):
+                return None
+            if timezone.is_naive(completed_at):
+                completed_at = timezone.make_aware(completed_at)
+        return BasicFactsResult(
+            student_id=student_id,
+            level_id=level_id,
+            session_id=session_id,
+            score=entry.get('score', 0),
+            total_points=entry.get('total_points', 10),
+            time_taken_seconds=entry.get('time_taken_seconds', 0),
+            points=round(points, 2),
+            completed_at=completed_at,
+        )
+
+    def _insert(self, rows):
+        """Insert rows that don't exist yet and restore their completion dates; returns the number inserted"""
+        existing = set(BasicFactsResult.objects.filter(
+            student_id__in={row.student_id for row in rows},
+            session_id__in={row.session_id for row in rows},
+        ).values_list('student_id', 'level_id', 'session_id'))
+
+        # completed_at is auto_now_add, so bulk_create stamps the rows with now;
+        # keep the original dates to restore afterwards
+        completed_dates = {
+            (row.student_id, row.level_id, row.session_id): row.completed_at
+            for row in rows
+            if (row.student_id, row.level_id, row.session_id) not in existing
+        }
+        BasicFactsResult.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+        inserted = list(BasicFactsResult.objects.filter(
+            student_id__in={key[0] for key in completed_dates},
+            session_id__in={key[2] for key in completed_dates},
+        ))
+        to_update = []
+        for result in inserted:
+            completed_at = completed_dates.get((result.student_id, result.level_id, result.session_id))
+            if completed_at:
+                result.completed_at = completed_at
+                to_update.append(result)
+        BasicFactsResult.objects.bulk_update(to_update, ['completed_at'], batch_size=500)
+        return len(to_update)
@@ -0,0 +1,44 @@
+"""
+Rebuild the per-student daily activity rollup.
+
+Quiz completions keep StudentDailyActivity up to date as attempts complete;
+this command rebuilds it from the attempt history to fill in history or
+repair drift, in full, for a range of days, or for one student.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maths.models import CustomUser
+from maths.topic_statistics import rebuild_daily_activity
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-student daily activity (time, attempts, points) from attempt history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild days from this date (YYYY-MM-DD)")
+        parser.add_argument('--until', help="Only rebuild days up to and including this date (YYYY-MM-DD)")
+        parser.add_argument('--student', help="Only rebuild this student (username)")
+
+    def _parse_date(self, value, option):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid {option} date: {value}")
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['since'], '--since')
+        end_date = self._parse_date(options['until'], '--until')
+
+        student_ids = None
+        if options['student']:
+            student = CustomUser.objects.filter(username=options['student']).first()
+            if student is None:
+                raise CommandError(f"No such student: {options['student']}")
+            student_ids = [student.pk]
+
+        written = rebuild_daily_activity(start_date, end_date, student_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily activity rows"))
@@ -0,0 +1,30 @@
+"""
+Rebuild the daily topic-level statistics buckets.
+
+Quiz completions keep the buckets up to date as attempts complete; this
+command rebuilds them from the attempt history to repair drift, either in
+full or from a given date.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maths.topic_statistics import rebuild_daily_statistics
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily topic-level statistics buckets (used for 7/30/90 day windows) from attempt history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild buckets from this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        start_date = None
+        if options['since']:
+            try:
+                start_date = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since date: {options['since']}")
+
+        written = rebuild_daily_statistics(start_date)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily statistics buckets"))
@@ -0,0 +1,61 @@
+"""
+Full recompute of TopicLevelStatistics.
+
+Quiz completions keep the statistics up to date incrementally from the
+students' StudentTopicBest rows; this command rebuilds them from the same
+rows with bulk writes to repair drift, or with --verify reports the
+difference without changing anything.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from maths.models import TopicLevelStatistics
+from maths.topic_statistics import recompute_topic_statistics
+from maths.versioned_cache import cache_is_shared
+
+
+class Command(BaseCommand):
+    help = "Recompute topic-level statistics (average and sigma) from students' current bests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--level', type=int, help="Only recompute this level number")
+        parser.add_argument('--topic', help="Only recompute this topic name")
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help="Compare the incremental statistics against a full recompute without saving",
+        )
+
+    def handle(self, *args, **options):
+        before = self._snapshot()
+
+        with transaction.atomic():
+            recompute_topic_statistics(level_num=options['level'], topic_name=options['topic'])
+            after = self._snapshot()
+            if options['verify']:
+                transaction.set_rollback(True)
+
+        drifted = 0
+        for key, recomputed in sorted(after.items()):
+            current = before.get(key)
+            if current != recomputed:
+                drifted += 1
+                self.stdout.write(f"{key[0]} / {key[1]}: incremental={current} recomputed={recomputed}")
+
+        if options['verify']:
+            self.stdout.write(self.style.SUCCESS(f"Verified {len(after)} statistics rows, {drifted} differ"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Recomputed {len(after)} statistics rows, {drifted} changed"))
+            if drifted and not cache_is_shared():
+                self.stderr.write(self.style.WARNING(
+                    "CACHES uses a per-process backend, so running web processes keep their cached "
+                    "statistics; restart them, or set CACHE_BACKEND to a shared backend"
+                ))
+
+    def _snapshot(self):
+        return {
+            (stats.level.level_number, stats.topic.name): (
+                float(stats.average_points), float(stats.sigma), stats.student_count
+            )
+            for stats in TopicLevelStatistics.objects.select_related('level', 'topic')
+        }
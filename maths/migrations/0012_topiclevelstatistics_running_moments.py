@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+def seed_running_moments(apps, schema_editor):
+    TopicLevelStatistics = apps.get_model('maths', 'TopicLevelStatistics')
+    # Seed the Welford accumulators from the rounded summary columns so
+    # incremental updates continue from the existing statistics
+    for stats in TopicLevelStatistics.objects.all():
+        sigma = float(stats.sigma)
+        stats.running_mean = float(stats.average_points)
+        stats.running_m2 = sigma * sigma * stats.student_count
+        stats.save(update_fields=['running_mean', 'running_m2'])
+
+
+def reverse_seed(apps, schema_editor):
+    # No reverse operation needed
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0011_add_student_final_answer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topiclevelstatistics',
+            name='running_m2',
+            field=models.FloatField(default=0, help_text='Running sum of squared deviations from the mean (Welford)'),
+        ),
+        migrations.AddField(
+            model_name='topiclevelstatistics',
+            name='running_mean',
+            field=models.FloatField(default=0, help_text="Unrounded running mean of students' best points (Welford)"),
+        ),
+        migrations.RunPython(seed_running_moments, reverse_seed),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BASIC_FACTS_SUBTOPICS = ['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts']
+
+
+def _fold_attempts(attempts):
+    """
+    Fold chronologically ordered attempts into best records, the same way
+    StudentTopicBest.record_attempt does on write.
+    attempts: iterable of (key, session_id, points, time_seconds, completed_at)
+    """
+    bests = {}
+    for key, session_id, points, time_seconds, completed_at in attempts:
+        best = bests.get(key)
+        if best is None:
+            bests[key] = {
+                'best_points': points,
+                'best_time_seconds': time_seconds,
+                'best_session_id': session_id,
+                'best_achieved_at': completed_at,
+                'previous_best_points': None,
+                'attempt_count': 1,
+                'last_attempt_at': completed_at,
+            }
+            continue
+        best['attempt_count'] += 1
+        best['last_attempt_at'] = completed_at
+        if points > best['best_points']:
+            best['previous_best_points'] = best['best_points']
+            best['best_points'] = points
+            best['best_time_seconds'] = time_seconds
+            best['best_session_id'] = session_id
+            best['best_achieved_at'] = completed_at
+    return bests
+
+
+def backfill_student_topic_best(apps, schema_editor):
+    from django.db.models import Max
+
+    StudentFinalAnswer = apps.get_model('maths', 'StudentFinalAnswer')
+    StudentAnswer = apps.get_model('maths', 'StudentAnswer')
+    BasicFactsResult = apps.get_model('maths', 'BasicFactsResult')
+    Level = apps.get_model('maths', 'Level')
+    StudentTopicBest = apps.get_model('maths', 'StudentTopicBest')
+
+    # Topic quizzes and mixed quizzes
+    final_answers = StudentFinalAnswer.objects.order_by('last_updated_time', 'id').values_list(
+        'student_id', 'level_id', 'topic_id', 'session_id', 'points_earned', 'last_updated_time'
+    ).iterator()
+    bests = _fold_attempts(
+        ((student_id, level_id, topic_id), session_id, points, 0, updated)
+        for student_id, level_id, topic_id, session_id, points, updated in final_answers
+    )
+
+    # Times of the best attempts live on StudentAnswer
+    best_sessions = [best['best_session_id'] for best in bests.values()]
+    session_times = {}
+    for start in range(0, len(best_sessions), 500):
+        rows = StudentAnswer.objects.filter(
+            session_id__in=best_sessions[start:start + 500],
+            time_taken_seconds__gt=0
+        ).values('student_id', 'session_id').annotate(time_taken=Max('time_taken_seconds')).order_by()
+        for row in rows:
+            session_times[(row['student_id'], row['session_id'])] = row['time_taken']
+    for (student_id, level_id, topic_id), best in bests.items():
+        best['best_time_seconds'] = session_times.get((student_id, best['best_session_id']), 0)
+
+    # Basic Facts: each level belongs to one subtopic
+    level_subtopics = dict(Level.topics.through.objects.filter(
+        topic__name__in=BASIC_FACTS_SUBTOPICS
+    ).values_list('level_id', 'topic_id'))
+    basic_facts = BasicFactsResult.objects.order_by('completed_at', 'id').values_list(
+        'student_id', 'level_id', 'session_id', 'points', 'time_taken_seconds', 'completed_at'
+    ).iterator()
+    bests.update(_fold_attempts(
+        ((student_id, level_id, level_subtopics[level_id]), session_id, points, time_seconds, completed_at)
+        for student_id, level_id, session_id, points, time_seconds, completed_at in basic_facts
+        if level_id in level_subtopics
+    ))
+
+    StudentTopicBest.objects.bulk_create([
+        StudentTopicBest(student_id=student_id, level_id=level_id, topic_id=topic_id, **best)
+        for (student_id, level_id, topic_id), best in bests.items()
+    ], batch_size=500)
+
+
+def reverse_backfill(apps, schema_editor):
+    # Table is dropped by the reverse of CreateModel
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0012_topiclevelstatistics_running_moments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentTopicBest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_points', models.DecimalField(decimal_places=2, help_text='Highest points across all attempts', max_digits=10)),
+                ('best_time_seconds', models.PositiveIntegerField(default=0, help_text='Time taken in the best attempt')),
+                ('best_session_id', models.CharField(blank=True, default='', help_text='Session identifier of the best attempt', max_length=100)),
+                ('best_achieved_at', models.DateTimeField(help_text='When the best attempt was completed')),
+                ('previous_best_points', models.DecimalField(blank=True, decimal_places=2, help_text='Best points before the current best attempt', max_digits=10, null=True)),
+                ('attempt_count', models.PositiveIntegerField(default=0, help_text='Number of completed attempts')),
+                ('last_attempt_at', models.DateTimeField(help_text='When the latest attempt was completed')),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_bests', to='maths.level')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_bests', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_bests', to='maths.topic')),
+            ],
+            options={
+                'ordering': ['level__level_number', 'topic__name'],
+                'unique_together': {('student', 'level', 'topic')},
+            },
+        ),
+        migrations.RunPython(backfill_student_topic_best, reverse_backfill),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:02
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def seed_quantile_sketches(apps, schema_editor):
+    from maths.sketches import QuantileSketch
+
+    TopicLevelStatistics = apps.get_model('maths', 'TopicLevelStatistics')
+    StudentTopicBest = apps.get_model('maths', 'StudentTopicBest')
+    # Build each sketch from the students' current bests; age-bucketed Basic
+    # Facts rows have no direct StudentTopicBest rows and are filled in by the
+    # recompute_topic_statistics command (sigma banding is used until then)
+    best_points = defaultdict(list)
+    for level_id, topic_id, points in StudentTopicBest.objects.values_list(
+        'level_id', 'topic_id', 'best_points'
+    ).iterator():
+        best_points[(level_id, topic_id)].append(float(points))
+
+    to_update = []
+    for stats in TopicLevelStatistics.objects.all():
+        points = best_points.get((stats.level_id, stats.topic_id))
+        if points:
+            stats.quantile_sketch = QuantileSketch.from_values(points).to_dict()
+            to_update.append(stats)
+    TopicLevelStatistics.objects.bulk_update(to_update, ['quantile_sketch'], batch_size=500)
+
+
+def reverse_seed(apps, schema_editor):
+    # No reverse operation needed
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0013_studenttopicbest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topiclevelstatistics',
+            name='quantile_sketch',
+            field=models.JSONField(blank=True, default=dict, help_text="Serialized KLL quantile sketch of students' best points"),
+        ),
+        migrations.RunPython(seed_quantile_sketches, reverse_seed),
+    ]
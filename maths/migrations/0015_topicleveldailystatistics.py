@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:24
+
+from datetime import datetime, time
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+BASIC_FACTS_SUBTOPICS = ['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts']
+
+
+def backfill_daily_statistics(apps, schema_editor):
+    StudentFinalAnswer = apps.get_model('maths', 'StudentFinalAnswer')
+    BasicFactsResult = apps.get_model('maths', 'BasicFactsResult')
+    Level = apps.get_model('maths', 'Level')
+    StudentTopicBest = apps.get_model('maths', 'StudentTopicBest')
+    TopicLevelDailyStatistics = apps.get_model('maths', 'TopicLevelDailyStatistics')
+
+    # Each student's best per topic-level and local day
+    level_subtopics = dict(Level.topics.through.objects.filter(
+        topic__name__in=BASIC_FACTS_SUBTOPICS
+    ).values_list('level_id', 'topic_id'))
+    attempts = list(StudentFinalAnswer.objects.values_list(
+        'student_id', 'level_id', 'topic_id', 'points_earned', 'last_updated_time'
+    ).order_by().iterator())
+    attempts.extend(
+        (student_id, level_id, level_subtopics[level_id], points, completed_at)
+        for student_id, level_id, points, completed_at in BasicFactsResult.objects.values_list(
+            'student_id', 'level_id', 'points', 'completed_at'
+        ).order_by().iterator()
+        if level_id in level_subtopics
+    )
+    day_bests = {}
+    for student_id, level_id, topic_id, points, completed_at in attempts:
+        key = (level_id, topic_id, timezone.localdate(completed_at), student_id)
+        if key not in day_bests or points > day_bests[key]:
+            day_bests[key] = points
+
+    buckets = {}
+    for (level_id, topic_id, date, student_id), points in day_bests.items():
+        bucket = buckets.get((level_id, topic_id, date))
+        if bucket is None:
+            bucket = buckets[(level_id, topic_id, date)] = TopicLevelDailyStatistics(
+                level_id=level_id, topic_id=topic_id, date=date,
+                student_count=0, points_sum=0, points_sum_squares=0,
+            )
+        points = float(points)
+        bucket.student_count += 1
+        bucket.points_sum += points
+        bucket.points_sum_squares += points * points
+    TopicLevelDailyStatistics.objects.bulk_create(buckets.values(), batch_size=500)
+
+    # Seed today's day-best so incremental updates continue from the buckets
+    today = timezone.localdate()
+    bests_today = list(StudentTopicBest.objects.filter(
+        last_attempt_at__gte=timezone.make_aware(datetime.combine(today, time.min))
+    ))
+    for best in bests_today:
+        best.day_best_points = day_bests.get((best.level_id, best.topic_id, today, best.student_id))
+    StudentTopicBest.objects.bulk_update(bests_today, ['day_best_points'], batch_size=500)
+
+
+def reverse_backfill(apps, schema_editor):
+    # Table is dropped by the reverse of CreateModel
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0014_topiclevelstatistics_quantile_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studenttopicbest',
+            name='day_best_points',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Best points on the local day of the latest attempt', max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='TopicLevelDailyStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Local (Pacific/Auckland) day of the bucket')),
+                ('student_count', models.PositiveIntegerField(default=0, help_text='Number of students who completed this topic-level on the day')),
+                ('points_sum', models.FloatField(default=0, help_text="Sum of the students' best points for the day")),
+                ('points_sum_squares', models.FloatField(default=0, help_text="Sum of squares of the students' best points for the day")),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='maths.level')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_statistics', to='maths.topic')),
+            ],
+            options={
+                'ordering': ['level__level_number', 'topic__name', 'date'],
+                'unique_together': {('level', 'topic', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_statistics, reverse_backfill),
+    ]
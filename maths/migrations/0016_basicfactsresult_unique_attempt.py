@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:12
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def remove_duplicate_results(apps, schema_editor):
+    BasicFactsResult = apps.get_model('maths', 'BasicFactsResult')
+    # Results without a session id can't be told apart; give each its own id
+    for result in BasicFactsResult.objects.filter(session_id=''):
+        result.session_id = f"legacy-{result.pk}"
+        result.save(update_fields=['session_id'])
+
+    # Keep the first row of each attempt saved more than once
+    duplicates = BasicFactsResult.objects.values('student_id', 'level_id', 'session_id').annotate(
+        first_id=Min('id'), row_count=Count('id')
+    ).filter(row_count__gt=1).order_by()
+    for duplicate in duplicates:
+        BasicFactsResult.objects.filter(
+            student_id=duplicate['student_id'],
+            level_id=duplicate['level_id'],
+            session_id=duplicate['session_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+def reverse_remove(apps, schema_editor):
+    # Removed duplicates are not restored
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0015_topicleveldailystatistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_results, reverse_remove),
+        migrations.AlterUniqueTogether(
+            name='basicfactsresult',
+            unique_together={('student', 'level', 'session_id')},
+        ),
+    ]
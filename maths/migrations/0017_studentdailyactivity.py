@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:43
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def backfill_daily_activity(apps, schema_editor):
+    StudentAnswer = apps.get_model('maths', 'StudentAnswer')
+    StudentFinalAnswer = apps.get_model('maths', 'StudentFinalAnswer')
+    BasicFactsResult = apps.get_model('maths', 'BasicFactsResult')
+    StudentDailyActivity = apps.get_model('maths', 'StudentDailyActivity')
+
+    # Topic attempts are timed by their answer session
+    session_seconds = {
+        (student_id, session_id): seconds
+        for student_id, session_id, seconds in StudentAnswer.objects.filter(
+            time_taken_seconds__gt=0
+        ).exclude(session_id='').values('student_id', 'session_id').annotate(
+            seconds=Max('time_taken_seconds')
+        ).values_list('student_id', 'session_id', 'seconds').order_by()
+    }
+
+    activity = defaultdict(lambda: [0, 0, 0.0])
+    for student_id, session_id, points, completed_at in StudentFinalAnswer.objects.values_list(
+        'student_id', 'session_id', 'points_earned', 'last_updated_time'
+    ).order_by().iterator():
+        row = activity[(student_id, timezone.localdate(completed_at))]
+        row[0] += session_seconds.get((student_id, session_id), 0)
+        row[1] += 1
+        row[2] += float(points)
+    for student_id, seconds, points, completed_at in BasicFactsResult.objects.values_list(
+        'student_id', 'time_taken_seconds', 'points', 'completed_at'
+    ).order_by().iterator():
+        row = activity[(student_id, timezone.localdate(completed_at))]
+        row[0] += seconds
+        row[1] += 1
+        row[2] += float(points)
+
+    StudentDailyActivity.objects.bulk_create([
+        StudentDailyActivity(student_id=student_id, date=date, seconds=seconds, attempts=attempts, points=points)
+        for (student_id, date), (seconds, attempts, points) in activity.items()
+    ], batch_size=500)
+
+
+def reverse_backfill(apps, schema_editor):
+    # Table is dropped by the reverse of CreateModel
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0016_basicfactsresult_unique_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Local (Pacific/Auckland) day')),
+                ('seconds', models.PositiveIntegerField(default=0, help_text='Seconds spent on attempts completed on the day')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of attempts completed on the day')),
+                ('points', models.FloatField(default=0, help_text="Sum of the points earned by the day's attempts")),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['student', '-date'],
+                'unique_together': {('student', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_activity, reverse_backfill),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0017_studentdailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='basicfactsresult',
+            index=models.Index(fields=['student', 'completed_at'], name='maths_basic_student_17c76b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentanswer',
+            index=models.Index(fields=['student', 'answered_at'], name='maths_stude_student_484d2d_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_attempt_answers(apps, schema_editor):
+    StudentAnswer = apps.get_model('maths', 'StudentAnswer')
+    AttemptAnswer = apps.get_model('maths', 'AttemptAnswer')
+
+    # Earlier sessions were overwritten in place; log what survives
+    batch = []
+    for row in StudentAnswer.objects.exclude(session_id='').values(
+        'student_id', 'session_id', 'question_id', 'question__level_id', 'question__topic_id',
+        'selected_answer_id', 'text_answer', 'is_correct', 'points_earned', 'time_taken_seconds', 'answered_at',
+    ).order_by().iterator():
+        batch.append(AttemptAnswer(
+            student_id=row['student_id'],
+            session_id=row['session_id'],
+            question_id=row['question_id'],
+            level_id=row['question__level_id'],
+            topic_id=row['question__topic_id'],
+            selected_answer_id=row['selected_answer_id'],
+            text_answer=row['text_answer'],
+            is_correct=row['is_correct'],
+            points_earned=row['points_earned'],
+            time_taken_seconds=row['time_taken_seconds'],
+            answered_at=row['answered_at'],
+        ))
+        if len(batch) >= 1000:
+            AttemptAnswer.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    AttemptAnswer.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def reverse_backfill(apps, schema_editor):
+    # Table is dropped by the reverse of CreateModel
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maths', '0018_student_time_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(help_text='Session identifier of the attempt', max_length=100)),
+                ('text_answer', models.TextField(blank=True)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('points_earned', models.PositiveIntegerField(default=0)),
+                ('time_taken_seconds', models.PositiveIntegerField(default=0, help_text='Time taken for the whole attempt in seconds')),
+                ('answered_at', models.DateTimeField(help_text='When the question was answered')),
+                ('level', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_answers', to='maths.level')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_answers', to='maths.question')),
+                ('selected_answer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='maths.answer')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_answers', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempt_answers', to='maths.topic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'session_id'], name='maths_attem_student_d1cbca_idx'), models.Index(fields=['level', 'topic', 'answered_at'], name='maths_attem_level_i_271333_idx')],
+                'unique_together': {('session_id', 'question')},
+            },
+        ),
+        migrations.RunPython(backfill_attempt_answers, reverse_backfill),
+    ]
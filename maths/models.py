@@ -107,10 +107,65 @@ class StudentAnswer(models.Model):
     class Meta:
         unique_together = ("student", "question")
         ordering = ['-answered_at']
+        indexes = [
+            # Per-student history in time order and local-day ranges
+            models.Index(fields=['student', 'answered_at']),
+        ]
     
     def __str__(self):
         return f"{self.student} - {self.question} - {'Correct' if self.is_correct else 'Incorrect'}"
 
+class AttemptAnswer(models.Model):
+    """
+    Append-only log of the answers in each attempt, one row per (session, question).
+    StudentAnswer keeps only a student's latest answer to each question (a
+    retake overwrites it), which in-progress quizzes still read and write; when
+    an attempt completes its answers are copied here with one bulk_create
+    (see maths.utils.save_attempt_answers), so every session's history is
+    kept. Rows are never updated, so history and statistics queries are range
+    scans that don't contend with quizzes in progress.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="attempt_answers")
+    session_id = models.CharField(max_length=100, help_text="Session identifier of the attempt")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="attempt_answers")
+    # Copied from the question so range scans by level and topic need no join
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name="attempt_answers")
+    topic = models.ForeignKey(Topic, on_delete=models.SET_NULL, null=True, blank=True, related_name="attempt_answers")
+    selected_answer = models.ForeignKey(Answer, on_delete=models.SET_NULL, null=True, blank=True)
+    text_answer = models.TextField(blank=True)
+    is_correct = models.BooleanField(default=False)
+    points_earned = models.PositiveIntegerField(default=0)
+    time_taken_seconds = models.PositiveIntegerField(default=0, help_text="Time taken for the whole attempt in seconds")
+    answered_at = models.DateTimeField(help_text="When the question was answered")
+
+    class Meta:
+        unique_together = ("session_id", "question")
+        indexes = [
+            models.Index(fields=['student', 'session_id']),
+            models.Index(fields=['level', 'topic', 'answered_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.session_id} - {self.question_id} - {'Correct' if self.is_correct else 'Incorrect'}"
+
+    @classmethod
+    def from_student_answer(cls, student_answer):
+        """Log row for a StudentAnswer (its question must be loaded)"""
+        question = student_answer.question
+        return cls(
+            student_id=student_answer.student_id,
+            session_id=student_answer.session_id,
+            question=question,
+            level_id=question.level_id,
+            topic_id=question.topic_id,
+            selected_answer_id=student_answer.selected_answer_id,
+            text_answer=student_answer.text_answer,
+            is_correct=student_answer.is_correct,
+            points_earned=student_answer.points_earned,
+            time_taken_seconds=student_answer.time_taken_seconds,
+            answered_at=student_answer.answered_at,
+        )
+
 class BasicFactsResult(models.Model):
     """Store Basic Facts quiz attempts in database for persistent tracking"""
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="basic_facts_results")
@@ -123,10 +178,14 @@ class BasicFactsResult(models.Model):
     completed_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
+        # One result per attempt; lets bulk imports skip existing rows with ignore_conflicts
+        unique_together = ("student", "level", "session_id")
         ordering = ['-completed_at']
         indexes = [
             models.Index(fields=['student', 'level']),
             models.Index(fields=['student', 'level', 'session_id']),
+            # Per-student local-day ranges
+            models.Index(fields=['student', 'completed_at']),
         ]
     
     def __str__(self):
@@ -147,34 +206,134 @@ class TimeLog(models.Model):
     def __str__(self):
         return f"{self.student.username} - Daily: {self.daily_total_seconds}s, Weekly: {self.weekly_total_seconds}s"
     
-    def reset_daily_if_needed(self):
-        """Reset daily time if it's past midnight (local time)"""
+    @staticmethod
+    def local_periods(now=None):
+        """(today, Monday of this week, ISO week number) in local time"""
+        from datetime import timedelta
         from django.utils import timezone
         from django.utils.timezone import localtime
-        # Use local time for date calculations
-        now_local = localtime(timezone.now())
-        today = now_local.date()
-        if self.last_reset_date < today:
-            self.daily_total_seconds = 0
-            self.last_reset_date = today
-            self.save(update_fields=['daily_total_seconds', 'last_reset_date'])
-    
-    def reset_weekly_if_needed(self):
-        """Reset weekly time if it's past Sunday midnight (Monday 00:00) in local time"""
+        today = localtime(now or timezone.now()).date()
+        return today, today - timedelta(days=today.weekday()), today.isocalendar()[1]
+
+    def current_totals(self, now=None):
+        """
+        (daily, weekly) seconds as of now. The counters belong to the local
+        day in last_reset_date; counters from an earlier day or week read as 0
+        until the next sync rolls them over.
+        """
+        today, week_start, _ = self.local_periods(now)
+        daily = self.daily_total_seconds if self.last_reset_date >= today else 0
+        weekly = self.weekly_total_seconds if self.last_reset_date >= week_start else 0
+        return daily, weekly
+
+    @classmethod
+    def sync_from_activity(cls, student_ids, now=None):
+        """
+        Copy the students' daily and weekly totals from StudentDailyActivity,
+        writing only the rows whose values changed. Returns the number of rows written.
+        """
+        from django.db.models import Q, Sum
         from django.utils import timezone
-        from django.utils.timezone import localtime
-        # Use local time for week calculations
-        now_local = localtime(timezone.now())
-        current_week = now_local.isocalendar()[1]  # ISO week number
-        current_year = now_local.year
-        
-        # Check if we need to reset (new week)
-        # Week resets on Monday (weekday 0) at midnight local time
-        if self.last_reset_week != current_week:
-            # Week has changed, reset weekly total
-            self.weekly_total_seconds = 0
-            self.last_reset_week = current_week
-            self.save(update_fields=['weekly_total_seconds', 'last_reset_week'])
+        now = now or timezone.now()
+        today, week_start, week_number = cls.local_periods(now)
+
+        totals = {student_id: (0, 0) for student_id in student_ids}
+        for row in StudentDailyActivity.objects.filter(
+            student_id__in=totals, date__gte=week_start, date__lte=today
+        ).values('student_id').annotate(
+            daily=Sum('seconds', filter=Q(date=today)),
+            weekly=Sum('seconds'),
+        ).order_by():
+            totals[row['student_id']] = (row['daily'] or 0, row['weekly'] or 0)
+
+        existing = {time_log.student_id: time_log for time_log in cls.objects.filter(student_id__in=totals)}
+        written = 0
+        for student_id, (daily, weekly) in totals.items():
+            time_log = existing.get(student_id)
+            if time_log and time_log.current_totals(now) == (daily, weekly):
+                continue
+            values = {
+                'daily_total_seconds': daily,
+                'weekly_total_seconds': weekly,
+                'last_reset_date': today,
+                'last_reset_week': week_number,
+                'last_activity': now,
+            }
+            # update() skips the auto_now fields, which would otherwise stamp the server date
+            if time_log:
+                cls.objects.filter(pk=time_log.pk).update(**values)
+            else:
+                cls.objects.get_or_create(student_id=student_id, defaults=values)
+            written += 1
+        return written
+
+class StudentDailyActivity(models.Model):
+    """
+    Per-student rollup of completed attempts for each local (Pacific/Auckland)
+    day, maintained as attempts complete (see maths.utils.record_activity).
+    Daily and weekly time are sums over at most 7 rows, and per-day activity
+    for reports needs no scan of the answer history. TimeLog is a debounced
+    copy of these totals.
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="daily_activity")
+    date = models.DateField(help_text="Local (Pacific/Auckland) day")
+    seconds = models.PositiveIntegerField(default=0, help_text="Seconds spent on attempts completed on the day")
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of attempts completed on the day")
+    points = models.FloatField(default=0, help_text="Sum of the points earned by the day's attempts")
+
+    class Meta:
+        unique_together = ("student", "date")
+        ordering = ['student', '-date']
+
+    def __str__(self):
+        return f"{self.student} - {self.date}: {self.seconds}s, {self.attempts} attempts"
+
+    @classmethod
+    def record(cls, student, seconds, points, now=None):
+        """Atomically add a completed attempt to the student's row for the local day"""
+        from django.db.models import F
+        from django.utils import timezone
+        date = timezone.localdate(now or timezone.now())
+        seconds = max(0, int(seconds))
+        points = float(points or 0)
+
+        updates = {
+            'seconds': F('seconds') + seconds,
+            'attempts': F('attempts') + 1,
+            'points': F('points') + points,
+        }
+        if cls.objects.filter(student=student, date=date).update(**updates):
+            return
+        _, created = cls.objects.get_or_create(student=student, date=date, defaults={
+            'seconds': seconds,
+            'attempts': 1,
+            'points': points,
+        })
+        if not created:
+            # Another request created the row first
+            cls.objects.filter(student=student, date=date).update(**updates)
+
+    @classmethod
+    def time_totals(cls, student, now=None):
+        """(daily, weekly) seconds for the local day and week (from Monday), in one query"""
+        today, week_start, _ = TimeLog.local_periods(now)
+        daily = weekly = 0
+        for date, seconds in cls.objects.filter(
+            student=student, date__gte=week_start, date__lte=today
+        ).values_list('date', 'seconds'):
+            weekly += seconds
+            if date == today:
+                daily = seconds
+        return daily, weekly
+
+# Minimum number of results in the quantile sketch before colour bands are
+# based on percentiles rather than average and sigma
+PERCENTILE_BANDING_MIN_COUNT = 20
+
+# Share of a quantile sketch's entries that may be superseded bests before
+# the sketch is rebuilt from the current bests
+SKETCH_REBUILD_SUPERSEDED_SHARE = 0.1
+
 
 class TopicLevelStatistics(models.Model):
     """Store average and standard deviation (sigma) for each topic-level combination"""
@@ -183,8 +342,11 @@ class TopicLevelStatistics(models.Model):
     average_points = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Average points across all students")
     sigma = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Standard deviation (sigma)")
     student_count = models.PositiveIntegerField(default=0, help_text="Number of students who have completed this topic-level")
+    running_mean = models.FloatField(default=0, help_text="Unrounded running mean of students' best points (Welford)")
+    running_m2 = models.FloatField(default=0, help_text="Running sum of squared deviations from the mean (Welford)")
+    quantile_sketch = models.JSONField(default=dict, blank=True, help_text="Serialized KLL quantile sketch of students' best points")
     last_updated = models.DateTimeField(auto_now=True, help_text="Last time statistics were calculated")
-    
+
     class Meta:
         unique_together = ("level", "topic")
         ordering = ['level__level_number', 'topic__name']
@@ -194,12 +356,125 @@ class TopicLevelStatistics(models.Model):
     
     def __str__(self):
         return f"{self.level} - {self.topic}: avg={self.average_points}, σ={self.sigma} (n={self.student_count})"
-    
+
+    def add_points(self, points):
+        """Add one student's best points to the running moments (Welford update)"""
+        points = float(points)
+        self.student_count += 1
+        delta = points - self.running_mean
+        self.running_mean += delta / self.student_count
+        self.running_m2 += delta * (points - self.running_mean)
+
+    def remove_points(self, points):
+        """Remove one student's previous best points from the running moments (inverse Welford update)"""
+        points = float(points)
+        if self.student_count <= 1:
+            self.student_count = 0
+            self.running_mean = 0.0
+            self.running_m2 = 0.0
+            return
+        previous_mean = (self.student_count * self.running_mean - points) / (self.student_count - 1)
+        self.running_m2 -= (points - previous_mean) * (points - self.running_mean)
+        self.running_m2 = max(self.running_m2, 0.0)  # Guard against float drift
+        self.running_mean = previous_mean
+        self.student_count -= 1
+
+    def refresh_summary(self):
+        """Copy the running moments into the rounded average_points and sigma columns"""
+        import math
+        if self.student_count:
+            self.average_points = round(self.running_mean, 2)
+            self.sigma = round(math.sqrt(self.running_m2 / self.student_count), 2)
+        else:
+            self.average_points = 0
+            self.sigma = 0
+
+    @classmethod
+    def record_best_change(cls, level, topic, previous_best, new_best):
+        """
+        Apply a student's new best result to the statistics in O(1).
+        previous_best is None the first time a student completes this topic-level;
+        otherwise the old best is swapped out for the new one.
+        """
+        return cls.record_best_changes(level.pk, topic.pk, [(previous_best, new_best)])
+
+    @classmethod
+    def record_best_changes(cls, level_id, topic_id, changes):
+        """Apply a batch of (previous_best, new_best) changes with a single row write"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            stats, created = cls.objects.select_for_update().get_or_create(level_id=level_id, topic_id=topic_id)
+            sketch = stats.get_sketch()
+            for previous_best, new_best in changes:
+                if previous_best is not None:
+                    stats.remove_points(previous_best)
+                stats.add_points(new_best)
+                # The sketch can't remove values, so a superseded best stays in it
+                # until rebuild_sketch replaces it (see sketch_needs_rebuild)
+                sketch.add(new_best)
+            stats.quantile_sketch = sketch.to_dict()
+            stats.refresh_summary()
+            stats.save()
+        return stats
+
+    def sketch_needs_rebuild(self):
+        """Whether superseded bests make up too much of the quantile sketch"""
+        superseded = self.get_sketch().count - self.student_count
+        return superseded > 0 and superseded > self.student_count * SKETCH_REBUILD_SUPERSEDED_SHARE
+
+    @classmethod
+    def rebuild_sketch(cls, level_id, topic_id):
+        """
+        Rebuild a topic-level's quantile sketch from the students' current
+        bests, dropping superseded ones. The running moments are exact and
+        left alone.
+        """
+        from django.db import transaction
+        from .sketches import QuantileSketch
+
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(level_id=level_id, topic_id=topic_id).first()
+            if stats is None:
+                return None
+            bests = StudentTopicBest.objects.filter(
+                level_id=level_id, topic_id=topic_id
+            ).values_list('best_points', flat=True)
+            stats.quantile_sketch = QuantileSketch.from_values([float(points) for points in bests]).to_dict()
+            stats.save(update_fields=['quantile_sketch', 'last_updated'])
+        return stats
+
+    def get_sketch(self):
+        """Quantile sketch of students' best points for this topic-level"""
+        from .sketches import QuantileSketch
+        return QuantileSketch.from_dict(self.quantile_sketch)
+
     def get_color_class(self, student_points):
         """
-        Determine color class based on student's points relative to average and sigma
+        Determine color class based on student's points relative to the other students.
+        Uses the student's percentile in the quantile sketch once there are enough
+        results, so skewed or outlier-heavy distributions still band sensibly;
+        otherwise falls back to average and sigma.
         Returns: 'dark-green', 'green', 'light-green', 'yellow', 'orange', 'red'
         """
+        sketch = self.get_sketch()
+        # The sketch may still hold superseded bests, so count students from the moments
+        if self.student_count >= PERCENTILE_BANDING_MIN_COUNT and sketch.count:
+            percentile = sketch.rank(student_points) * 100
+            # Same proportions as the sigma bands would give on a normal distribution
+            if percentile > 97.7:
+                return 'dark-green'  # top ~2%
+            elif percentile > 84.1:
+                return 'green'  # next ~14%
+            elif percentile > 15.9:
+                return 'light-green'  # middle ~68%
+            elif percentile > 2.3:
+                return 'yellow'  # next ~14%
+            elif percentile > 0.1:
+                return 'orange'  # next ~2%
+            else:
+                return 'red'  # bottom ~0.1%
+
         if self.sigma == 0 or self.student_count < 2:
             # Not enough data for meaningful comparison
             return 'light-green'
@@ -224,6 +499,93 @@ class TopicLevelStatistics(models.Model):
         else:
             return 'red'  # < avg - 3σ
 
+# Rolling windows (in days) offered on top of the daily statistics buckets
+ROLLING_WINDOW_DAYS = (7, 30, 90)
+
+
+class TopicLevelDailyStatistics(models.Model):
+    """
+    Pre-aggregated daily bucket for a topic-level: count, sum and sum of squares
+    of each student's best points on that (local) day. Statistics for any date
+    range, e.g. the last 7/30/90 days or a school term, are computed by summing
+    the bucket rows instead of rescanning answers. A student who completes the
+    topic-level on several days is counted once per day.
+    """
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name="daily_statistics")
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name="daily_statistics")
+    date = models.DateField(help_text="Local (Pacific/Auckland) day of the bucket")
+    student_count = models.PositiveIntegerField(default=0, help_text="Number of students who completed this topic-level on the day")
+    points_sum = models.FloatField(default=0, help_text="Sum of the students' best points for the day")
+    points_sum_squares = models.FloatField(default=0, help_text="Sum of squares of the students' best points for the day")
+
+    class Meta:
+        unique_together = ("level", "topic", "date")
+        ordering = ['level__level_number', 'topic__name', 'date']
+
+    def __str__(self):
+        return f"{self.level} - {self.topic} on {self.date}: n={self.student_count}"
+
+    @classmethod
+    def record_day_best_changes(cls, level_id, topic_id, date, changes):
+        """Apply a batch of (previous_day_best, day_best) changes to one bucket with a single row write"""
+        from django.db import transaction
+
+        with transaction.atomic():
+            bucket, created = cls.objects.select_for_update().get_or_create(level_id=level_id, topic_id=topic_id, date=date)
+            for previous_day_best, day_best in changes:
+                if previous_day_best is not None:
+                    previous_day_best = float(previous_day_best)
+                    bucket.student_count -= 1
+                    bucket.points_sum -= previous_day_best
+                    bucket.points_sum_squares -= previous_day_best * previous_day_best
+                day_best = float(day_best)
+                bucket.student_count += 1
+                bucket.points_sum += day_best
+                bucket.points_sum_squares += day_best * day_best
+            bucket.save()
+        return bucket
+
+    @classmethod
+    def summarize(cls, start_date, end_date=None, level_ids=None):
+        """
+        Statistics over the buckets from start_date to end_date (inclusive, default
+        today), for every topic-level in one grouped query. Returns
+        {(level_id, topic_id): {'student_count', 'average_points', 'sigma'}}.
+        """
+        import math
+        from django.db.models import Sum
+        from django.utils import timezone
+
+        end_date = end_date or timezone.localdate()
+        buckets = cls.objects.filter(date__gte=start_date, date__lte=end_date)
+        if level_ids is not None:
+            buckets = buckets.filter(level_id__in=level_ids)
+        summaries = {}
+        for row in buckets.values('level_id', 'topic_id').annotate(
+            count=Sum('student_count'), total=Sum('points_sum'), total_squares=Sum('points_sum_squares')
+        ).order_by():
+            count = row['count'] or 0
+            if not count:
+                continue
+            mean = row['total'] / count
+            variance = max(row['total_squares'] / count - mean * mean, 0.0)  # Guard against float drift
+            summaries[(row['level_id'], row['topic_id'])] = {
+                'student_count': count,
+                'average_points': round(mean, 2),
+                'sigma': round(math.sqrt(variance), 2),
+            }
+        return summaries
+
+    @classmethod
+    def rolling(cls, days, level_ids=None):
+        """Statistics for the last `days` days, including today (see summarize)"""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        today = timezone.localdate()
+        return cls.summarize(today - timedelta(days=days - 1), today, level_ids=level_ids)
+
+
 class StudentFinalAnswer(models.Model):
     """
     Store aggregated results for each quiz attempt.
@@ -302,3 +664,91 @@ class StudentFinalAnswer(models.Model):
             topic=topic,
             level=level
         ).order_by('-attempt_number').first()
+
+class StudentTopicBest(models.Model):
+    """
+    Denormalized best result per student-level-topic, maintained on write.
+    Avoids scanning every past attempt to find a student's record.
+    For Basic Facts the topic is the level's subtopic (Addition, Subtraction, etc.).
+    """
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="topic_bests")
+    level = models.ForeignKey(Level, on_delete=models.CASCADE, related_name="student_bests")
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name="student_bests")
+    best_points = models.DecimalField(max_digits=10, decimal_places=2, help_text="Highest points across all attempts")
+    best_time_seconds = models.PositiveIntegerField(default=0, help_text="Time taken in the best attempt")
+    best_session_id = models.CharField(max_length=100, blank=True, default="", help_text="Session identifier of the best attempt")
+    best_achieved_at = models.DateTimeField(help_text="When the best attempt was completed")
+    previous_best_points = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Best points before the current best attempt")
+    attempt_count = models.PositiveIntegerField(default=0, help_text="Number of completed attempts")
+    last_attempt_at = models.DateTimeField(help_text="When the latest attempt was completed")
+    day_best_points = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Best points on the local day of the latest attempt")
+
+    class Meta:
+        unique_together = ("student", "level", "topic")
+        ordering = ['level__level_number', 'topic__name']
+
+    def __str__(self):
+        return f"{self.student} - {self.level} {self.topic}: best={self.best_points} ({self.attempt_count} attempts)"
+
+    @classmethod
+    def record_attempt(cls, student, level, topic, session_id, points, time_taken_seconds=0, is_new_attempt=True):
+        """
+        Fold a completed attempt into the student's best result.
+        Returns (previous_best, best, day_change): the best points before this
+        attempt (None on the first attempt) and after it, and for the daily
+        statistics buckets either None or (previous_day_best, day_best) when
+        the attempt raised the student's best for today.
+        is_new_attempt is False when an existing attempt is saved again, so it
+        is not counted twice.
+        """
+        from decimal import Decimal
+        from django.db import transaction
+        from django.utils import timezone
+
+        now = timezone.now()
+        points = Decimal(str(points)).quantize(Decimal('0.01'))
+
+        with transaction.atomic():
+            best, created = cls.objects.select_for_update().get_or_create(
+                student=student,
+                level=level,
+                topic=topic,
+                defaults={
+                    'best_points': points,
+                    'best_time_seconds': time_taken_seconds,
+                    'best_session_id': session_id,
+                    'best_achieved_at': now,
+                    'attempt_count': 1,
+                    'last_attempt_at': now,
+                    'day_best_points': points,
+                }
+            )
+            if created:
+                return None, best.best_points, (None, points)
+
+            previous_best = best.best_points
+            previous_day_best = None
+            if timezone.localdate(best.last_attempt_at) == timezone.localdate(now):
+                previous_day_best = best.day_best_points
+            day_change = None
+            if previous_day_best is None or points > previous_day_best:
+                best.day_best_points = points
+                day_change = (previous_day_best, points)
+
+            if is_new_attempt:
+                best.attempt_count += 1
+            best.last_attempt_at = now
+            if points > best.best_points:
+                best.previous_best_points = best.best_points
+                best.best_points = points
+                best.best_time_seconds = time_taken_seconds
+                best.best_session_id = session_id
+                best.best_achieved_at = now
+            best.save()
+        return previous_best, best.best_points, day_change
+
+    def best_before(self, session_id):
+        """Best points excluding the given attempt, assuming it is the student's latest attempt"""
+        if session_id == self.best_session_id:
+            return self.previous_best_points
+        return self.best_points
@@ -0,0 +1,403 @@
+"""
+Student progress for the detailed dashboard.
+
+Loads everything for one student in a fixed handful of aggregated queries
+and builds progress_by_level and basic_facts_progress in memory, so the
+query count doesn't grow with the number of topics a student has touched.
+Colours come from the cached statistics (maths.statistics_cache) and the
+Basic Facts bucket ids from maths.buckets, neither of which queries per row.
+
+The built progress is kept as a per-student snapshot in Django's cache,
+stamped with the student's progress version. Completing an attempt bumps the
+version (see maths.signals), so repeat dashboard loads are a single cache
+read until the student's results change. Colours are applied when the
+snapshot is read, so they follow statistics updates without a rebuild.
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .buckets import calculate_age_from_dob, get_age_level_id, get_formatted_topic_id
+from .catalog import get_basic_facts_by_subtopic
+from .constants import BASIC_FACTS_TOPIC_CONFIG, YEAR_QUESTION_COUNTS
+from .models import AttemptAnswer, BasicFactsResult, Question, StudentFinalAnswer, StudentTopicBest, Topic
+from .statistics_cache import get_statistics
+from .topic_statistics import session_points
+
+# Bump when the snapshot layout changes so old snapshots are ignored
+SNAPSHOT_FORMAT = 2
+# Snapshots also expire, bounding staleness from writes that bypass the signals
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def display_level_number(level_number):
+    """Level number shown to students: Basic Facts levels restart at 1 for each subtopic"""
+    for config in BASIC_FACTS_TOPIC_CONFIG.values():
+        start = config["start_level"]
+        if start <= level_number < start + config["level_count"]:
+            return level_number - start + 1
+    return level_number
+
+
+def color_class_for(level_id, topic_id, points):
+    """Colour band for points against the topic-level statistics ('light-green' if there are none)"""
+    stats = get_statistics(level_id, topic_id) if level_id and topic_id else None
+    if stats:
+        try:
+            return stats.get_color_class(points)
+        except Exception:
+            pass  # If statistics can't be read, use default color
+    return 'light-green'
+
+
+def load_topic_bests(student):
+    """Best result per (level_id, topic_id), maintained on write (one indexed query)"""
+    return {
+        (best.level_id, best.topic_id): best
+        for best in StudentTopicBest.objects.filter(student=student)
+    }
+
+
+def build_progress_by_level(student, topic_bests):
+    """
+    One row per level-topic the student has attempted, sorted by level number.
+    StudentFinalAnswer is the source of truth for completed quizzes; answers
+    not yet in StudentFinalAnswer are counted from the AttemptAnswer log when
+    the attempt is complete (90% or more of the question limit).
+    """
+    # Query 1: every completed attempt
+    final_answers = list(StudentFinalAnswer.objects.filter(student=student).values(
+        'level_id', 'level__level_number', 'topic_id', 'topic__name',
+        'session_id', 'points_earned', 'last_updated_time'
+    ).order_by())
+
+    # Query 2: one row per logged attempt (student, session, level, topic)
+    sessions = list(AttemptAnswer.objects.filter(
+        student=student, topic__isnull=False
+    ).values(
+        'session_id', 'level_id', 'level__level_number', 'topic__name'
+    ).annotate(
+        answer_count=Count('id'),
+        correct_count=Count('id', filter=Q(is_correct=True)),
+        points_total=Sum('points_earned'),
+        time_taken=Max('time_taken_seconds'),
+        answered_at=Max('answered_at'),
+    ).order_by())
+
+    # Level-topic combinations from both sources
+    level_topic_keys = {}
+    for fa in final_answers:
+        level_topic_keys[(fa['level__level_number'], fa['topic__name'])] = fa['level_id']
+    for session in sessions:
+        key = (session['level__level_number'], session['topic__name'])
+        level_topic_keys.setdefault(key, session['level_id'])
+
+    # Query 3: topic names are not unique; use the first (lowest id) match
+    topic_ids = {
+        row['name']: row['first_id']
+        for row in Topic.objects.filter(
+            name__in={name for _, name in level_topic_keys}
+        ).values('name').annotate(first_id=Min('id')).order_by()
+    }
+
+    attempts_by_level_topic = defaultdict(list)
+    best_final_answer = {}
+    for fa in final_answers:
+        key = (fa['level_id'], fa['topic_id'])
+        attempts_by_level_topic[key].append(fa)
+        points = float(fa['points_earned'])
+        best_final_answer[key] = max(best_final_answer.get(key, points), points)
+
+    # Time taken per session, from the answers of each attempt
+    session_times = {}
+    sessions_by_level_topic = defaultdict(list)
+    for session in sessions:
+        if session['time_taken']:
+            session_times[session['session_id']] = max(
+                session_times.get(session['session_id'], 0), session['time_taken']
+            )
+        key = (session['level__level_number'], session['topic__name'])
+        sessions_by_level_topic[key].append(session)
+
+    # Query 4 (only when needed): available questions for the answer log fallback
+    fallback_keys = [
+        (level_id, topic_ids.get(name))
+        for (level_number, name), level_id in level_topic_keys.items()
+        if (level_id, topic_ids.get(name)) not in attempts_by_level_topic
+    ]
+    available_questions = {}
+    if fallback_keys:
+        available_questions = {
+            (row['level_id'], row['topic_id']): row['question_count']
+            for row in Question.objects.filter(
+                level_id__in={level_id for level_id, _ in fallback_keys},
+                topic_id__in={topic_id for _, topic_id in fallback_keys if topic_id},
+            ).values('level_id', 'topic_id').annotate(question_count=Count('id')).order_by()
+        }
+
+    age = calculate_age_from_dob(student.date_of_birth)
+    progress_by_level = []
+    for (level_num, topic_name), level_id in level_topic_keys.items():
+        topic_id = topic_ids.get(topic_name)
+        level_name = f"Level {level_num}" if level_num >= 100 else f"Year {level_num}"
+
+        attempts_data = []
+        if (level_id, topic_id) in attempts_by_level_topic:
+            for fa in attempts_by_level_topic[(level_id, topic_id)]:
+                attempts_data.append({
+                    'points': float(fa['points_earned']),
+                    'time_seconds': session_times.get(fa['session_id'], 0),
+                    'date': fa['last_updated_time'],
+                })
+        else:
+            # FALLBACK: Use the logged answers (attempts without a StudentFinalAnswer)
+            available = available_questions.get((level_id, topic_id), 0)
+            standard_limit = YEAR_QUESTION_COUNTS.get(level_num, 10)
+            question_limit = min(available, standard_limit) if available > 0 else standard_limit
+            # Allow partial results if they're close to the limit (90% or more)
+            partial_threshold = int(question_limit * 0.9)
+            for session in sessions_by_level_topic[(level_num, topic_name)]:
+                if session['answer_count'] < partial_threshold:
+                    continue
+                points = session_points(session)
+                attempts_data.append({
+                    'points': round(points, 2) if session['time_taken'] else float(points),
+                    'time_seconds': session['time_taken'] or 0,
+                    'date': session['answered_at'],
+                })
+
+        if not attempts_data:
+            continue
+
+        points_list = [a['points'] for a in attempts_data]
+        best_score = max(points_list)
+        best_attempt = max(attempts_data, key=lambda x: x['points'])
+
+        # Prefer the best record maintained on write, and pick the statistics bucket
+        if level_num < 100:
+            stats_level_id, stats_topic_id = level_id, topic_id
+            topic_best = topic_bests.get((level_id, topic_id))
+            if topic_best:
+                best_score = float(topic_best.best_points)
+        else:
+            # Basic Facts: use age-based level and formatted topic
+            stats_level_id = get_age_level_id(age) if age else None
+            stats_topic_id = get_formatted_topic_id(level_num, topic_name) if age else None
+            if (stats_level_id, stats_topic_id) in best_final_answer:
+                best_score = best_final_answer[(stats_level_id, stats_topic_id)]
+
+        progress_by_level.append({
+            'level_number': level_num,
+            'level_name': level_name,
+            'topic_name': topic_name,
+            'total_attempts': len(attempts_data),
+            'best_points': best_score,
+            'best_time_seconds': best_attempt['time_seconds'],
+            'best_date': best_attempt['date'],
+            'min_points': min(points_list),
+            'max_points': max(points_list),
+            'avg_points': round(sum(points_list) / len(points_list), 1),
+            'stats_key': (stats_level_id, stats_topic_id),
+        })
+
+    # Sort by level number
+    progress_by_level.sort(key=lambda x: x['level_number'])
+    return progress_by_level
+
+
+def basic_facts_level_summaries(student):
+    """
+    Best Basic Facts attempt and attempt count for every level, in one query.
+    Returns {level_id: {'best_points', 'best_time_seconds', 'best_date', 'attempt_count'}}.
+
+    Uses ROW_NUMBER()/COUNT() windows partitioned by level over the student's
+    results (served by the (student, level) index). Databases without window
+    support (SQLite before 3.25) get a GROUP BY with correlated subqueries for
+    the best attempt's time and date instead; still a single statement.
+    """
+    results = BasicFactsResult.objects.filter(student=student)
+    # Ties go to the earliest attempt, like StudentTopicBest
+    best_first = [F('points').desc(), F('completed_at').asc(), F('id').asc()]
+
+    if connections[results.db].features.supports_over_clause:
+        rows = results.annotate(
+            best_rank=Window(RowNumber(), partition_by=[F('level_id')], order_by=best_first),
+            attempt_count=Window(Count('id'), partition_by=[F('level_id')]),
+        ).filter(best_rank=1).order_by().values_list(
+            'level_id', 'points', 'time_taken_seconds', 'completed_at', 'attempt_count'
+        )
+    else:
+        best = results.filter(level_id=OuterRef('level_id')).order_by(*best_first)
+        rows = results.values('level_id').annotate(
+            best_points=Max('points'),
+            best_time_seconds=Subquery(best.values('time_taken_seconds')[:1]),
+            best_date=Subquery(best.values('completed_at')[:1]),
+            attempt_count=Count('id'),
+        ).order_by().values_list(
+            'level_id', 'best_points', 'best_time_seconds', 'best_date', 'attempt_count'
+        )
+
+    return {
+        level_id: {
+            'best_points': points,
+            'best_time_seconds': time_seconds,
+            'best_date': completed_at,
+            'attempt_count': attempt_count,
+        }
+        for level_id, points, time_seconds, completed_at, attempt_count in rows
+    }
+
+
+def build_basic_facts_progress(student, basic_facts_by_subtopic):
+    """
+    Best Basic Facts result per level, grouped by subtopic and sorted by
+    display level (one query, see basic_facts_level_summaries).
+    """
+    age = calculate_age_from_dob(student.date_of_birth)
+    summaries = basic_facts_level_summaries(student)
+
+    basic_facts_progress = {}
+    for subtopic_name, levels in basic_facts_by_subtopic.items():
+        basic_facts_progress[subtopic_name] = []
+        for level in levels:
+            summary = summaries.get(level.id)
+            if not summary:
+                continue
+
+            best_points = float(summary['best_points'])
+            # Colour from the age level (2000 + age) and topic {level_number}_{subtopic}
+            stats_level_id = get_age_level_id(age) if age else None
+            stats_topic_id = get_formatted_topic_id(level.level_number, subtopic_name) if age else None
+            basic_facts_progress[subtopic_name].append({
+                'display_level': display_level_number(level.level_number),
+                'level_number': level.level_number,
+                'best_points': best_points,
+                'best_time_seconds': summary['best_time_seconds'],
+                'best_date': summary['best_date'],
+                'total_attempts': summary['attempt_count'],
+                'stats_key': (stats_level_id, stats_topic_id),
+            })
+    for rows in basic_facts_progress.values():
+        rows.sort(key=lambda x: x['display_level'])
+    return basic_facts_progress
+
+
+def apply_color_classes(rows):
+    """Set each progress row's color_class from its statistics bucket (no queries)"""
+    for row in rows:
+        stats_key = row.get('stats_key')
+        if stats_key:
+            row['color_class'] = color_class_for(*stats_key, row['best_points'])
+
+
+def _snapshot_key(student_id):
+    return f'maths:progress:{SNAPSHOT_FORMAT}:{student_id}'
+
+
+def _version_key(student_id):
+    return f'maths:progress_version:{student_id}'
+
+
+def invalidate_progress_snapshot(student_id):
+    """Mark a student's progress snapshot stale (called when their results change)"""
+    try:
+        cache.incr(_version_key(student_id))
+    except ValueError:
+        # No version yet: start from the clock so it can't match an old snapshot
+        cache.set(_version_key(student_id), int(time.time() * 1000), timeout=None)
+
+
+def build_student_progress(student):
+    """Build the progress snapshot for a student from the database"""
+    topic_bests = load_topic_bests(student)
+    return {
+        'progress_by_level': build_progress_by_level(student, topic_bests),
+        'basic_facts_progress': build_basic_facts_progress(student, get_basic_facts_by_subtopic()),
+    }
+
+
+def get_student_progress(student):
+    """
+    Student's progress as {'progress_by_level', 'basic_facts_progress'},
+    from the cached snapshot when it is current (one cache read) and rebuilt
+    otherwise. Colours are applied on every read.
+    """
+    snapshot_key, version_key = _snapshot_key(student.pk), _version_key(student.pk)
+    cached = cache.get_many([snapshot_key, version_key])
+    version = cached.get(version_key)
+    snapshot = cached.get(snapshot_key)
+
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), timeout=None)
+        version = cache.get(version_key)
+
+    if snapshot is None or snapshot.get('version') != version:
+        # Stamp with the version read before building, so a result saved
+        # during the build leaves the snapshot stale rather than lost
+        snapshot = build_student_progress(student)
+        snapshot['version'] = version
+        cache.set(snapshot_key, snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+    apply_color_classes(snapshot['progress_by_level'])
+    for rows in snapshot['basic_facts_progress'].values():
+        apply_color_classes(rows)
+    return snapshot
+
+
+def _serialize_row(row, **extra):
+    from django.utils import dateformat
+    from django.utils.timezone import localtime
+    from .templatetags.practice_extras import format_time
+
+    best_date = row.get('best_date')
+    return {
+        **extra,
+        'best_points': row['best_points'],
+        'best_time_seconds': row['best_time_seconds'],
+        'best_time_display': format_time(row['best_time_seconds']),
+        'best_date': best_date.isoformat() if best_date else None,
+        'best_date_display': dateformat.format(localtime(best_date), "M d, Y H:i") if best_date else 'N/A',
+        'total_attempts': row['total_attempts'],
+        'color_class': row.get('color_class', 'light-green'),
+    }
+
+
+def serialize_progress(progress, year=None):
+    """
+    JSON-ready progress for the progress API: topic rows grouped by level
+    (optionally only one level number) and Basic Facts rows grouped by subtopic.
+    """
+    levels = []
+    for row in progress['progress_by_level']:
+        if year is not None and row['level_number'] != year:
+            continue
+        if not levels or levels[-1]['level_number'] != row['level_number']:
+            levels.append({
+                'level_number': row['level_number'],
+                'level_name': row['level_name'],
+                'rows': [],
+            })
+        levels[-1]['rows'].append(_serialize_row(
+            row,
+            topic_name=row['topic_name'],
+            min_points=row['min_points'],
+            max_points=row['max_points'],
+            avg_points=row['avg_points'],
+        ))
+
+    basic_facts = []
+    if year is None:
+        for subtopic_name, rows in progress['basic_facts_progress'].items():
+            if rows:
+                basic_facts.append({
+                    'subtopic_name': subtopic_name,
+                    'rows': [
+                        _serialize_row(row, display_level=row['display_level'], level_number=row['level_number'])
+                        for row in rows
+                    ],
+                })
+    return {'levels': levels, 'basic_facts': basic_facts}
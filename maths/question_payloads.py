@@ -0,0 +1,84 @@
+"""
+Per-process cache of serialized questions for client-side topic quizzes.
+
+topic_quiz.html receives the quiz's questions as JSON, with each question's
+answers (id and text, never whether they are correct) in a fresh random
+order per attempt. The JSON for a question only changes when the question
+or one of its answers is edited, so each question's fragment is serialized
+once and kept with the question's updated_at; the Answer signal in
+maths.signals moves updated_at forward, and a fragment is rebuilt when the
+updated_at it was made from no longer matches. Each fragment also keeps the
+question's answer key, which is passed to maths.answer_keys whenever the
+question is served. Assembling a quiz joins the cached fragments after
+shuffling each question's answers.
+"""
+import json
+import random
+import threading
+
+from . import answer_keys
+
+_lock = threading.Lock()
+# {question_id: (updated_at, question JSON without its closing brace, [answer JSON, ...], answer key)}
+_fragments = {}
+
+
+def _serialize(question):
+    """Fragment for a question with its topic and answers loaded"""
+    head = json.dumps({
+        'id': question.id,
+        'question_text': question.question_text,
+        'question_type': question.question_type,
+        'image_url': question.image.url if question.image else None,
+        'points': question.points,
+    })
+    answers = [
+        json.dumps({'id': answer.id, 'answer_text': answer.answer_text})
+        for answer in question.answers.all()
+    ]
+    return question.updated_at, head[:-1], answers, answer_keys.build_key(question)
+
+
+def _get_fragments(entries, keys_version):
+    """
+    {question_id: fragment} for (question_id, updated_at) pairs, serializing
+    stale or missing ones. The answer keys kept with the fragments are handed
+    to maths.answer_keys, so the quiz's answers are graded without a query.
+    """
+    from .models import Question
+
+    with _lock:
+        found = {
+            question_id: _fragments[question_id]
+            for question_id, updated_at in entries
+            if question_id in _fragments and _fragments[question_id][0] == updated_at
+        }
+
+    missing = [question_id for question_id, _ in entries if question_id not in found]
+    if missing:
+        questions = Question.objects.filter(id__in=missing).select_related('topic').prefetch_related('answers')
+        loaded = {question.id: _serialize(question) for question in questions}
+        with _lock:
+            _fragments.update(loaded)
+        found.update(loaded)
+
+    answer_keys.remember_keys({question_id: fragment[3] for question_id, fragment in found.items()}, keys_version)
+    return found
+
+
+def get_quiz_json(entries, keys_version):
+    """
+    JSON list of the quiz's questions, in order, for (question_id, updated_at)
+    pairs, with each question's answers shuffled for this attempt. Questions
+    that no longer exist are left out. keys_version is answer_keys.get_version()
+    read before the pool the entries came from.
+    """
+    fragments = _get_fragments(entries, keys_version)
+    questions = []
+    for question_id, _ in entries:
+        if question_id not in fragments:
+            continue
+        _, head, answers, _ = fragments[question_id]
+        answers = random.sample(answers, len(answers))
+        questions.append(f'{head}, "answers": [{", ".join(answers)}]}}')
+    return f'[{", ".join(questions)}]'
@@ -0,0 +1,71 @@
+"""
+Per-process pools of valid question ids per (level, topic).
+
+A pool lists the questions a topic quiz may serve, with each question's
+updated_at (which keys its cached payload, see maths.question_payloads) and
+answer counts, in the Question ordering (difficulty, then created_at) that
+stratified selection relies on. A question is valid when it has a correct
+answer and, for multiple choice and true/false, a wrong one too. Pools are
+built with one aggregate query on first use and kept until a Question or
+Answer changes: the signals in maths.signals bump a version counter in
+Django's cache, and each process drops its pools when the counter no
+longer matches what it loaded. Choosing a quiz's questions then costs a
+cache read.
+"""
+import threading
+
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = 'maths:question_pools:version'
+_version = VersionedCache(VERSION_KEY)
+get_version = _version.get_version
+invalidate = _version.invalidate
+
+# Question types that also need a wrong answer to choose from
+CHOICE_TYPES = ('multiple_choice', 'true_false')
+
+_lock = threading.Lock()
+_pools = {}  # {(level_id, topic_id): [(question_id, updated_at, answer_count, correct_count), ...]}
+_loaded_version = None
+
+
+def _build(level_id, topic_id):
+    from django.db.models import Count, Q
+
+    from .models import Question
+
+    rows = Question.objects.filter(level_id=level_id, topic_id=topic_id).annotate(
+        answer_count=Count('answers'),
+        correct_count=Count('answers', filter=Q(answers__is_correct=True)),
+    ).values_list(
+        'id', 'updated_at', 'question_type', 'answer_count', 'correct_count'
+    ).order_by('difficulty', 'created_at', 'id')
+
+    pool = []
+    for question_id, updated_at, question_type, answer_count, correct_count in rows:
+        if correct_count == 0:
+            continue
+        if question_type in CHOICE_TYPES and answer_count == correct_count:
+            continue
+        pool.append((question_id, updated_at, answer_count, correct_count))
+    return pool
+
+
+def get_pool(level_id, topic_id):
+    """[(question_id, updated_at, answer_count, correct_count)] of the valid questions for a level and topic"""
+    global _pools, _loaded_version
+
+    version = get_version()
+    with _lock:
+        if _loaded_version == version and (level_id, topic_id) in _pools:
+            return _pools[(level_id, topic_id)]
+
+    pool = _build(level_id, topic_id)
+    with _lock:
+        if _loaded_version != version:
+            if version != get_version():
+                return pool  # Built before an edit; use it once but don't keep it
+            _pools = {}
+            _loaded_version = version
+        _pools[(level_id, topic_id)] = pool
+    return pool
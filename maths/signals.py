@@ -0,0 +1,116 @@
+"""
+Signal handlers that keep the cached data (bucket ids, catalog, statistics,
+progress snapshots, activity watermarks, answer keys, question pools and
+payloads) consistent with the database
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import activity, answer_keys, buckets, catalog, question_pools, statistics_cache
+from .models import (
+    Answer, BasicFactsResult, ClassRoom, CustomUser, Enrollment, Level, Question, StudentAnswer, StudentFinalAnswer,
+    Topic, TopicLevelStatistics,
+)
+from .progress import invalidate_progress_snapshot
+
+
+@receiver([post_save, post_delete], sender=Level)
+def level_changed(sender, instance, **kwargs):
+    if buckets.is_age_level_number(instance.level_number):
+        transaction.on_commit(buckets.invalidate)
+    else:
+        transaction.on_commit(catalog.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Topic)
+def topic_changed(sender, instance, **kwargs):
+    if buckets.is_formatted_topic_name(instance.name):
+        transaction.on_commit(buckets.invalidate)
+    else:
+        transaction.on_commit(catalog.invalidate)
+
+
+@receiver(m2m_changed, sender=Level.topics.through)
+def level_topics_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(catalog.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Answer)
+def question_changed(sender, instance, **kwargs):
+    # Cached answer keys grade quiz answers and pools choose their questions;
+    # drop them once the edit is visible
+    transaction.on_commit(answer_keys.invalidate)
+    transaction.on_commit(question_pools.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    # A question's cached quiz payload is keyed by its updated_at, which
+    # should also move when one of its answers changes
+    Question.objects.filter(pk=instance.question_id).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=TopicLevelStatistics)
+def topic_statistics_changed(sender, instance, **kwargs):
+    # Bump after commit so other processes don't reload before the write is visible
+    transaction.on_commit(statistics_cache.bump_version)
+
+
+@receiver([post_save, post_delete], sender=StudentFinalAnswer)
+@receiver([post_save, post_delete], sender=BasicFactsResult)
+def student_result_changed(sender, instance, **kwargs):
+    # The student's cached progress snapshot is rebuilt on their next dashboard load
+    student_id = instance.student_id
+
+    def invalidate():
+        invalidate_progress_snapshot(student_id)
+        activity.touch(student_id)
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=StudentAnswer)
+def student_answer_changed(sender, instance, **kwargs):
+    # Answers feed the time log and measurements progress, not the snapshot
+    student_id = instance.student_id
+    transaction.on_commit(lambda: activity.touch(student_id))
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    # Enrolment decides which levels the student can see
+    student_id = instance.student_id
+    transaction.on_commit(lambda: activity.touch(student_id))
+
+
+@receiver(m2m_changed, sender=ClassRoom.levels.through)
+def classroom_levels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Level.classrooms changes (reverse) carry classroom ids in pk_set
+    classroom_ids = set(pk_set or ()) if reverse else {instance.pk}
+    if reverse and action == 'post_clear':
+        classroom_ids = None  # Cleared classrooms are no longer known; touch every enrolled student
+
+    def touch_students():
+        enrollments = Enrollment.objects.all()
+        if classroom_ids is not None:
+            enrollments = enrollments.filter(classroom_id__in=classroom_ids)
+        for student_id in set(enrollments.values_list('student_id', flat=True)):
+            activity.touch(student_id)
+    transaction.on_commit(touch_students)
+
+
+@receiver(post_save, sender=CustomUser)
+def student_changed(sender, instance, update_fields=None, **kwargs):
+    # Date of birth decides the Basic Facts statistics buckets; logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+
+    def invalidate():
+        invalidate_progress_snapshot(instance.pk)
+        activity.touch(instance.pk)
+    transaction.on_commit(invalidate)
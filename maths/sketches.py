@@ -0,0 +1,120 @@
+"""
+Mergeable streaming quantile sketch (KLL) for topic-level colour banding.
+
+The sketch keeps a bounded number of samples in levels of "compactors";
+an item at level h stands for 2**h original values. Sketches built
+separately (per time window or cohort) can be merged into one without
+going back to the raw answers. Accuracy is about 1-2% rank error with the
+default k=200, using at most a few hundred floats of storage.
+"""
+import math
+import random
+
+DEFAULT_K = 200
+_C = 2 / 3  # Capacity decay per level below the top
+
+
+class QuantileSketch:
+    def __init__(self, k=DEFAULT_K, levels=None, count=0):
+        self.k = k
+        self.levels = levels if levels is not None else [[]]
+        self.count = count
+
+    # Serialization (stored in TopicLevelStatistics.quantile_sketch)
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(
+            k=data.get('k', DEFAULT_K),
+            levels=[list(level) for level in data.get('levels', [[]])] or [[]],
+            count=data.get('n', 0),
+        )
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.count, 'levels': self.levels}
+
+    @classmethod
+    def from_values(cls, values, k=DEFAULT_K):
+        sketch = cls(k=k)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    # Updates
+
+    def add(self, value):
+        self.levels[0].append(float(value))
+        self.count += 1
+        self._compress()
+
+    def merge(self, other):
+        """Merge another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for height, items in enumerate(other.levels):
+            self.levels[height].extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _capacity(self, height):
+        depth = len(self.levels) - height - 1
+        return max(2, int(math.ceil(self.k * (_C ** depth))))
+
+    def _size(self):
+        return sum(len(items) for items in self.levels)
+
+    def _max_size(self):
+        return sum(self._capacity(height) for height in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for height, items in enumerate(self.levels):
+                if len(items) >= self._capacity(height):
+                    if height + 1 == len(self.levels):
+                        self.levels.append([])
+                    items.sort()
+                    # Keep an odd leftover at this level, promote every other item
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = random.randint(0, 1)
+                    self.levels[height + 1].extend(items[offset::2])
+                    self.levels[height] = leftover
+                    break
+
+    # Queries
+
+    def _weighted_items(self):
+        return sorted(
+            (value, 2 ** height)
+            for height, items in enumerate(self.levels)
+            for value in items
+        )
+
+    def rank(self, value):
+        """Fraction of values below value, counting ties as half (0.0 to 1.0)"""
+        value = float(value)
+        total = 0
+        below = 0
+        for item, weight in self._weighted_items():
+            total += weight
+            if item < value:
+                below += weight
+            elif item == value:
+                below += weight / 2
+        return below / total if total else 0.0
+
+    def quantile(self, fraction):
+        """Approximate value at the given fraction (0.0 to 1.0) of the distribution"""
+        items = self._weighted_items()
+        if not items:
+            return None
+        total = sum(weight for _, weight in items)
+        target = fraction * total
+        seen = 0
+        for item, weight in items:
+            seen += weight
+            if seen >= target:
+                return item
+        return items[-1][0]
@@ -0,0 +1,42 @@
+"""
+Per-process cache of the TopicLevelStatistics table for colour lookups.
+
+The whole table (a few hundred rows) is kept as a read-only map of
+{(level_id, topic_id): TopicLevelStatistics}, so dashboards look up colour
+bands without a query per progress row. Every statistics write bumps a
+version counter in Django's cache (see maths.versioned_cache); a process
+reloads its map when the counter no longer matches the version it loaded.
+"""
+import threading
+
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = 'maths:topic_statistics:version'
+_version = VersionedCache(VERSION_KEY)
+get_version = _version.get_version
+bump_version = _version.invalidate
+
+_lock = threading.Lock()
+_statistics = None  # {(level_id, topic_id): TopicLevelStatistics}
+_loaded_version = None
+
+
+def get_statistics_map():
+    """Map of {(level_id, topic_id): TopicLevelStatistics}, reloaded when the version changes"""
+    global _statistics, _loaded_version
+    from .models import TopicLevelStatistics
+
+    version = get_version()
+    with _lock:
+        if _statistics is None or _loaded_version != version:
+            _statistics = {
+                (stats.level_id, stats.topic_id): stats
+                for stats in TopicLevelStatistics.objects.all()
+            }
+            _loaded_version = version
+        return _statistics
+
+
+def get_statistics(level_id, topic_id):
+    """Cached statistics for a topic-level, or None if there are none yet"""
+    return get_statistics_map().get((level_id, topic_id))
@@ -0,0 +1,383 @@
+"""
+Set-based full recompute of TopicLevelStatistics.
+
+Quiz completions maintain the statistics incrementally (see
+maths.utils.save_student_final_answer). This module rebuilds them from the
+StudentTopicBest rows that path folds in, with one query and bulk writes;
+it backs the recompute_topic_statistics management command. The daily
+statistics buckets are rebuilt from the attempt history for the
+rebuild_daily_statistics command, and the per-student daily activity rollup
+for rebuild_daily_activity.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import buckets, statistics_cache
+from .buckets import calculate_age_from_dob
+from .constants import BASIC_FACTS_SUBTOPICS
+from .models import (
+    AttemptAnswer, BasicFactsResult, CustomUser, Level, StudentDailyActivity, StudentFinalAnswer,
+    StudentTopicBest, TopicLevelDailyStatistics, TopicLevelStatistics,
+)
+from .sketches import QuantileSketch
+
+
+def session_points(session):
+    """Points for one attempt: percentage * 100 * 60 / time_seconds, or raw points if untimed"""
+    time_seconds = session['time_taken'] or 0
+    if time_seconds > 0:
+        percentage = (session['correct_count'] / session['answer_count']) if session['answer_count'] else 0
+        return (percentage * 100 * 60) / time_seconds
+    return session['points_total'] or 0
+
+
+def compute_topic_statistics(level_num=None, topic_name=None):
+    """
+    Collect the best points of every student for each topic-level combination
+    from StudentTopicBest, the same bests the incremental path folds in.
+
+    Year levels (< 100) are keyed by (level_id, topic_id). Basic Facts
+    levels (>= 100) are keyed by ("age", age, level_number, topic_name) and
+    stored against the age level and formatted topic (see maths.buckets).
+
+    Returns a dict of {key: {student_id: best_points}}.
+    """
+    bests = StudentTopicBest.objects.all()
+    if level_num is not None:
+        bests = bests.filter(level__level_number=level_num)
+    if topic_name is not None:
+        bests = bests.filter(topic__name=topic_name)
+
+    rows = list(bests.values_list(
+        'student_id', 'level_id', 'topic_id', 'level__level_number', 'topic__name', 'best_points'
+    ).order_by())
+
+    # Ages of the students with Basic Facts bests
+    basic_facts_students = {row[0] for row in rows if row[3] >= 100}
+    student_ages = {
+        student_id: calculate_age_from_dob(date_of_birth)
+        for student_id, date_of_birth in CustomUser.objects.filter(
+            id__in=basic_facts_students
+        ).values_list('id', 'date_of_birth')
+    } if basic_facts_students else {}
+
+    student_best_points = defaultdict(dict)
+    for student_id, level_id, topic_id, level_number, name, best_points in rows:
+        if level_number < 100:
+            key = (level_id, topic_id)
+        else:
+            age = student_ages.get(student_id)
+            if not age:
+                continue  # Skip students without a date of birth
+            key = ('age', age, level_number, name)
+        student_best_points[key][student_id] = float(best_points)
+
+    return student_best_points
+
+
+def recompute_topic_statistics(level_num=None, topic_name=None):
+    """
+    Rebuild TopicLevelStatistics rows from the students' current bests and
+    write them with bulk_update/bulk_create. Returns the number of rows written.
+    """
+    student_best_points = compute_topic_statistics(level_num, topic_name)
+    if not student_best_points:
+        return 0
+
+    # Resolve the Basic Facts keys to their age level and formatted topic
+    resolved = {}
+    for key in student_best_points:
+        if key[0] == 'age':
+            _, age, level_number, name = key
+            resolved[key] = (
+                buckets.get_age_level_id(age, create=True),
+                buckets.get_formatted_topic_id(level_number, name, create=True),
+            )
+        else:
+            resolved[key] = key
+
+    existing = {
+        (stats.level_id, stats.topic_id): stats
+        for stats in TopicLevelStatistics.objects.filter(
+            level_id__in={level_id for level_id, _ in resolved.values()},
+            topic_id__in={topic_id for _, topic_id in resolved.values()}
+        )
+    }
+
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    for key, best_points in student_best_points.items():
+        if not best_points:
+            continue
+        points_list = list(best_points.values())
+        count = len(points_list)
+        avg = sum(points_list) / count
+        variance = sum((x - avg) ** 2 for x in points_list) / count
+
+        level_id, topic_id = resolved[key]
+        stats = existing.get((level_id, topic_id))
+        if stats is None:
+            stats = TopicLevelStatistics(level_id=level_id, topic_id=topic_id)
+            to_create.append(stats)
+        else:
+            to_update.append(stats)
+
+        stats.student_count = count
+        stats.running_mean = avg
+        stats.running_m2 = variance * count
+        # Rebuilding from current bests also drops superseded bests from the sketch
+        stats.quantile_sketch = QuantileSketch.from_values(points_list).to_dict()
+        stats.refresh_summary()
+        stats.last_updated = now
+
+    TopicLevelStatistics.objects.bulk_update(
+        to_update,
+        ['student_count', 'running_mean', 'running_m2', 'quantile_sketch', 'average_points', 'sigma', 'last_updated'],
+        batch_size=500,
+    )
+    TopicLevelStatistics.objects.bulk_create(to_create, batch_size=500)
+    # Bulk writes don't send post_save, so invalidate the statistics cache here
+    transaction.on_commit(statistics_cache.bump_version)
+    return len(to_update) + len(to_create)
+
+
+def _local_day_start(date):
+    """Aware datetime for midnight at the start of a local day"""
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def local_date_range(field, start_date=None, end_date=None):
+    """
+    Filter kwargs selecting rows whose datetime field falls on local days
+    start_date..end_date (inclusive; either end open if None). The local
+    midnights are converted to UTC bounds once, so the range is applied in
+    SQL against the stored UTC values and can use an index, and DST days of
+    23 or 25 hours are bounded correctly.
+    """
+    bounds = {}
+    if start_date is not None:
+        bounds[f'{field}__gte'] = _local_day_start(start_date)
+    if end_date is not None:
+        bounds[f'{field}__lt'] = _local_day_start(end_date + timedelta(days=1))
+    return bounds
+
+
+def compute_daily_day_bests(start_date=None):
+    """
+    Each student's best points per topic-level and local day, from the
+    StudentFinalAnswer and BasicFactsResult history.
+    Basic Facts results are keyed by the level's subtopic, as in StudentTopicBest.
+
+    Returns a dict of {(level_id, topic_id, date, student_id): best_points}.
+    """
+    final_answers = StudentFinalAnswer.objects.filter(**local_date_range('last_updated_time', start_date))
+    basic_facts = BasicFactsResult.objects.filter(**local_date_range('completed_at', start_date))
+
+    level_subtopics = dict(Level.topics.through.objects.filter(
+        topic__name__in=BASIC_FACTS_SUBTOPICS
+    ).values_list('level_id', 'topic_id'))
+
+    attempts = [
+        ((level_id, topic_id), student_id, points, completed_at)
+        for student_id, level_id, topic_id, points, completed_at in final_answers.values_list(
+            'student_id', 'level_id', 'topic_id', 'points_earned', 'last_updated_time'
+        ).order_by().iterator()
+    ]
+    attempts.extend(
+        ((level_id, level_subtopics[level_id]), student_id, points, completed_at)
+        for student_id, level_id, points, completed_at in basic_facts.values_list(
+            'student_id', 'level_id', 'points', 'completed_at'
+        ).order_by().iterator()
+        if level_id in level_subtopics
+    )
+
+    day_bests = {}
+    for (level_id, topic_id), student_id, points, completed_at in attempts:
+        key = (level_id, topic_id, timezone.localdate(completed_at), student_id)
+        if key not in day_bests or points > day_bests[key]:
+            day_bests[key] = points
+    return day_bests
+
+
+def rebuild_daily_statistics(start_date=None):
+    """
+    Rebuild the daily statistics buckets from start_date (default: all history)
+    and resync today's day-best on StudentTopicBest so incremental updates
+    continue from the rebuilt buckets.
+    Returns the number of bucket rows written.
+    """
+    day_bests = compute_daily_day_bests(start_date)
+
+    buckets_by_key = {}
+    for (level_id, topic_id, date, student_id), points in day_bests.items():
+        bucket = buckets_by_key.get((level_id, topic_id, date))
+        if bucket is None:
+            bucket = buckets_by_key[(level_id, topic_id, date)] = TopicLevelDailyStatistics(
+                level_id=level_id, topic_id=topic_id, date=date
+            )
+        points = float(points)
+        bucket.student_count += 1
+        bucket.points_sum += points
+        bucket.points_sum_squares += points * points
+
+    today = timezone.localdate()
+    with transaction.atomic():
+        existing = TopicLevelDailyStatistics.objects.all()
+        if start_date is not None:
+            existing = existing.filter(date__gte=start_date)
+        existing.delete()
+        TopicLevelDailyStatistics.objects.bulk_create(buckets_by_key.values(), batch_size=500)
+
+        bests_today = list(StudentTopicBest.objects.filter(last_attempt_at__gte=_local_day_start(today)))
+        for best in bests_today:
+            best.day_best_points = day_bests.get((best.level_id, best.topic_id, today, best.student_id))
+        StudentTopicBest.objects.bulk_update(bests_today, ['day_best_points'], batch_size=500)
+    return len(buckets_by_key)
+
+
+def compute_daily_activity(start_date=None, end_date=None, student_ids=None):
+    """
+    Each student's completed attempts per local day from start_date to
+    end_date (inclusive, default: all history), optionally only for some
+    students. Topic attempts are StudentFinalAnswer rows, timed by their
+    logged answers; Basic Facts attempts are BasicFactsResult rows.
+
+    Returns a dict of {(student_id, date): [seconds, attempts, points]}.
+    """
+    final_answers = StudentFinalAnswer.objects.filter(**local_date_range('last_updated_time', start_date, end_date))
+    answers = AttemptAnswer.objects.filter(
+        time_taken_seconds__gt=0, **local_date_range('answered_at', start_date, end_date)
+    )
+    basic_facts = BasicFactsResult.objects.filter(**local_date_range('completed_at', start_date, end_date))
+    if student_ids is not None:
+        # Served by the per-student indexes on each table
+        final_answers = final_answers.filter(student_id__in=student_ids)
+        answers = answers.filter(student_id__in=student_ids)
+        basic_facts = basic_facts.filter(student_id__in=student_ids)
+
+    # Every answer in a session carries the session's total time
+    session_seconds = {
+        (student_id, session_id): seconds
+        for student_id, session_id, seconds in answers.values('student_id', 'session_id').annotate(
+            seconds=Max('time_taken_seconds')
+        ).values_list('student_id', 'session_id', 'seconds').order_by()
+    }
+
+    activity = defaultdict(lambda: [0, 0, 0.0])
+    for student_id, session_id, points, completed_at in final_answers.values_list(
+        'student_id', 'session_id', 'points_earned', 'last_updated_time'
+    ).order_by().iterator():
+        row = activity[(student_id, timezone.localdate(completed_at))]
+        row[0] += session_seconds.get((student_id, session_id), 0)
+        row[1] += 1
+        row[2] += float(points)
+    for student_id, seconds, points, completed_at in basic_facts.values_list(
+        'student_id', 'time_taken_seconds', 'points', 'completed_at'
+    ).order_by().iterator():
+        row = activity[(student_id, timezone.localdate(completed_at))]
+        row[0] += seconds
+        row[1] += 1
+        row[2] += float(points)
+    return activity
+
+
+def rebuild_daily_activity(start_date=None, end_date=None, student_ids=None):
+    """
+    Rebuild the StudentDailyActivity rollup for local days start_date to
+    end_date (inclusive, default: all history), optionally only for some
+    students. Returns the number of rows written.
+    """
+    activity = compute_daily_activity(start_date, end_date, student_ids)
+    with transaction.atomic():
+        existing = StudentDailyActivity.objects.all()
+        if start_date is not None:
+            existing = existing.filter(date__gte=start_date)
+        if end_date is not None:
+            existing = existing.filter(date__lte=end_date)
+        if student_ids is not None:
+            existing = existing.filter(student_id__in=student_ids)
+        existing.delete()
+        StudentDailyActivity.objects.bulk_create([
+            StudentDailyActivity(student_id=student_id, date=date, seconds=seconds, attempts=attempts, points=points)
+            for (student_id, date), (seconds, attempts, points) in activity.items()
+        ], batch_size=500)
+    return len(activity)
+
+
+def fold_attempts(attempts):
+    """
+    Fold chronologically ordered attempts into best records, the same way
+    StudentTopicBest.record_attempt does on write.
+    attempts: iterable of (key, session_id, points, time_seconds, completed_at)
+    Returns {key: StudentTopicBest field values}.
+    """
+    today = timezone.localdate()
+    bests = {}
+    for key, session_id, points, time_seconds, completed_at in attempts:
+        day_points = points if timezone.localdate(completed_at) == today else None
+        best = bests.get(key)
+        if best is None:
+            bests[key] = {
+                'best_points': points,
+                'best_time_seconds': time_seconds,
+                'best_session_id': session_id,
+                'best_achieved_at': completed_at,
+                'previous_best_points': None,
+                'attempt_count': 1,
+                'last_attempt_at': completed_at,
+                'day_best_points': day_points,
+            }
+            continue
+        best['attempt_count'] += 1
+        best['last_attempt_at'] = completed_at
+        if day_points is not None and (best['day_best_points'] is None or day_points > best['day_best_points']):
+            best['day_best_points'] = day_points
+        if points > best['best_points']:
+            best['previous_best_points'] = best['best_points']
+            best['best_points'] = points
+            best['best_time_seconds'] = time_seconds
+            best['best_session_id'] = session_id
+            best['best_achieved_at'] = completed_at
+    return bests
+
+
+def rebuild_basic_facts_bests(student_level_pairs):
+    """
+    Rebuild the StudentTopicBest rows of the given (student_id, level_id)
+    Basic Facts pairs from their full BasicFactsResult history.
+    Returns the number of rows written.
+    """
+    student_level_pairs = set(student_level_pairs)
+    if not student_level_pairs:
+        return 0
+
+    level_subtopics = dict(Level.topics.through.objects.filter(
+        level_id__in={level_id for _, level_id in student_level_pairs},
+        topic__name__in=BASIC_FACTS_SUBTOPICS
+    ).order_by('-topic_id').values_list('level_id', 'topic_id'))  # Lowest topic id wins
+
+    results = BasicFactsResult.objects.filter(
+        student_id__in={student_id for student_id, _ in student_level_pairs},
+        level_id__in=set(level_subtopics),
+    ).order_by('completed_at', 'id').values_list(
+        'student_id', 'level_id', 'session_id', 'points', 'time_taken_seconds', 'completed_at'
+    )
+    bests = fold_attempts(
+        ((student_id, level_id, level_subtopics[level_id]), session_id, points, time_seconds, completed_at)
+        for student_id, level_id, session_id, points, time_seconds, completed_at in results.iterator()
+        if (student_id, level_id) in student_level_pairs
+    )
+
+    with transaction.atomic():
+        for student_id, level_id, topic_id in bests:
+            StudentTopicBest.objects.filter(student_id=student_id, level_id=level_id, topic_id=topic_id).delete()
+        StudentTopicBest.objects.bulk_create([
+            StudentTopicBest(student_id=student_id, level_id=level_id, topic_id=topic_id, **best)
+            for (student_id, level_id, topic_id), best in bests.items()
+        ], batch_size=500)
+    return len(bests)
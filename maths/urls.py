@@ -6,6 +6,7 @@ urlpatterns = [
     path("", views.dashboard, name="dashboard"),
     path("dashboard/", views.dashboard_detail, name="dashboard_detail"),
     path("topics/", views.topic_list, name="topics"),
+    path("statistics/", views.topic_statistics_report, name="topic_statistics"),
     path("topic/<int:topic_id>/levels/", views.level_list, name="levels"),
     path("level/<int:level_number>/", views.level_detail, name="level_detail"),
     path("create-class/", views.create_class, name="create_class"),
@@ -40,4 +41,6 @@ urlpatterns = [
     path("profile/", views.user_profile, name="user_profile"),
     path("api/update-time-log/", views.update_time_log, name="update_time_log"),
     path("api/submit-topic-answer/", views.submit_topic_answer, name="submit_topic_answer"),
+    path("api/submit-topic-answers/", views.submit_topic_answers, name="submit_topic_answers"),
+    path("api/progress/", views.progress_api, name="progress_api"),
 ]
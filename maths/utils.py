@@ -1,11 +1,17 @@
 """
 Utility functions for database operations with retry logic
 """
+import atexit
+import logging
+import threading
 import time
+from collections import defaultdict
 from functools import wraps
-from django.db import transaction, OperationalError
+from django.db import connection, transaction, OperationalError
 from django.db.utils import DatabaseError
 
+logger = logging.getLogger(__name__)
+
 
 def retry_on_db_lock(max_retries=5, delay=0.01, backoff=2):
     """
@@ -80,27 +86,352 @@ def atomic_with_retry(max_retries=5, delay=0.01, backoff=2):
 
 
 @retry_on_db_lock(max_retries=5)
-def save_student_final_answer(student, session_id, topic, level, points_earned):
+def save_student_final_answer(student, session_id, topic, level, points_earned, time_taken_seconds=0):
     """
     Helper function to save StudentFinalAnswer with retry logic.
     This wraps the common pattern of getting attempt number and saving.
+
+    The student's StudentTopicBest record is updated in the same transaction,
+    and if the attempt is a new best TopicLevelStatistics is updated
+    incrementally instead of being recomputed.
+
+    Returns the student's best points before this attempt (None on the first
+    attempt), for the "beat your record" check.
     """
-    from maths.models import StudentFinalAnswer
-    
-    attempt_number = StudentFinalAnswer.get_next_attempt_number(
-        student=student,
-        topic=topic,
-        level=level
+    from maths.models import StudentFinalAnswer, StudentTopicBest
+
+    with transaction.atomic():
+        attempt_number = StudentFinalAnswer.get_next_attempt_number(
+            student=student,
+            topic=topic,
+            level=level
+        )
+
+        final_answer, created = StudentFinalAnswer.objects.update_or_create(
+            student=student,
+            session_id=session_id,
+            defaults={
+                'topic': topic,
+                'level': level,
+                'attempt_number': attempt_number,
+                'points_earned': points_earned,
+            }
+        )
+
+        previous_best, best, day_change = StudentTopicBest.record_attempt(
+            student, level, topic, session_id, points_earned,
+            time_taken_seconds=time_taken_seconds,
+            is_new_attempt=created,
+        )
+
+    if best != previous_best:
+        schedule_best_change(level, topic, previous_best, best)
+    if day_change:
+        schedule_day_best_change(level, topic, *day_change)
+
+    return float(previous_best) if previous_best is not None else None
+
+
+@retry_on_db_lock(max_retries=5)
+def save_basic_facts_result(student, level, session_id, score, total_points, time_taken_seconds, points):
+    """
+    Save a BasicFactsResult and fold it into the student's StudentTopicBest
+    record for the level's subtopic.
+
+    Returns the student's best points before this attempt (None on the first
+    attempt), for the "beat your record" check.
+    """
+    from maths.constants import BASIC_FACTS_SUBTOPICS
+    from maths.models import BasicFactsResult, StudentTopicBest
+
+    with transaction.atomic():
+        BasicFactsResult.objects.create(
+            student=student,
+            level=level,
+            session_id=session_id,
+            score=score,
+            total_points=total_points,
+            time_taken_seconds=time_taken_seconds,
+            points=points,
+        )
+
+        subtopic = level.topics.filter(name__in=BASIC_FACTS_SUBTOPICS).first()
+        if not subtopic:
+            return None
+        previous_best, best, day_change = StudentTopicBest.record_attempt(
+            student, level, subtopic, session_id, points,
+            time_taken_seconds=time_taken_seconds,
+        )
+
+    if day_change:
+        schedule_day_best_change(level, subtopic, *day_change)
+
+    return float(previous_best) if previous_best is not None else None
+
+
+@retry_on_db_lock(max_retries=5)
+def save_attempt_answers(student, session_id):
+    """
+    Append a completed attempt's answers to the AttemptAnswer log with one
+    bulk insert. Answers already logged for the session are skipped, so a
+    repeated completion is harmless. Returns the number of answers in the attempt.
+    """
+    from maths.models import AttemptAnswer, StudentAnswer
+
+    if not session_id:
+        return 0
+    rows = [
+        AttemptAnswer.from_student_answer(student_answer)
+        for student_answer in StudentAnswer.objects.filter(
+            student=student, session_id=session_id
+        ).select_related('question')
+    ]
+    AttemptAnswer.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    return len(rows)
+
+
+@retry_on_db_lock(max_retries=5)
+def save_student_answers(student, session_id, answers):
+    """
+    Save a batch of graded answers as the student's latest StudentAnswer rows
+    with one upsert. answers are unsaved StudentAnswer instances for the
+    student; a retake overwrites the earlier answer to the same question.
+    """
+    from maths import activity
+    from maths.models import StudentAnswer
+
+    if not answers:
+        return 0
+    for answer in answers:
+        answer.student = student
+        answer.session_id = session_id
+
+    # MySQL upserts on any unique key and doesn't accept a conflict target
+    unique_fields = None
+    if connection.features.supports_update_conflicts_with_target:
+        unique_fields = ['student', 'question']
+    with transaction.atomic():
+        StudentAnswer.objects.bulk_create(
+            answers,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            # answered_at is auto_now_add, so bulk_create stamps it with now
+            update_fields=['selected_answer', 'text_answer', 'is_correct', 'points_earned', 'session_id', 'answered_at'],
+        )
+
+    # bulk_create doesn't send post_save, so move the watermark here
+    student_id = student.pk
+    transaction.on_commit(lambda: activity.touch(student_id))
+    return len(answers)
+
+
+@retry_on_db_lock(max_retries=5)
+def record_activity(student, seconds, points):
+    """
+    Add a completed attempt to the student's daily activity rollup. The
+    student's TimeLog is synced from the rollup afterwards, debounced (see
+    schedule_time_log_sync).
+    """
+    from maths import activity
+    from maths.models import StudentDailyActivity
+
+    with transaction.atomic():
+        StudentDailyActivity.record(student, seconds, points)
+
+    student_id = student.pk
+
+    def after_commit():
+        # The totals are served with the activity watermark as ETag
+        activity.touch(student_id)
+        schedule_time_log_sync(student_id)
+    transaction.on_commit(after_commit)
+
+
+# Students whose TimeLog is waiting to be synced from the activity rollup
+_pending_time_logs = set()
+_time_log_timer = None
+_time_log_lock = threading.Lock()
+
+
+def schedule_time_log_sync(student_id):
+    """
+    Queue a student's TimeLog to be synced from the daily activity rollup.
+    Syncs are debounced: pending students are written together at most once
+    per TIME_LOG_SYNC_INTERVAL seconds, and only if their totals changed.
+    """
+    from django.conf import settings
+
+    global _time_log_timer
+    interval = getattr(settings, 'TIME_LOG_SYNC_INTERVAL', 60)
+    with _time_log_lock:
+        _pending_time_logs.add(student_id)
+        if _time_log_timer is not None:
+            return  # A sync is already scheduled and will pick this student up
+        if interval > 0:
+            _time_log_timer = threading.Timer(interval, _submit_time_log_sync)
+            _time_log_timer.daemon = True
+            _time_log_timer.start()
+            return
+    _submit_time_log_sync()
+
+
+def _submit_time_log_sync():
+    from maths.jobs import background_jobs
+
+    global _time_log_timer
+    with _time_log_lock:
+        _time_log_timer = None
+    if not background_jobs.submit(('time_log_sync',), apply_pending_time_log_syncs):
+        # Queue is full: sync on this thread instead
+        apply_pending_time_log_syncs()
+
+
+def apply_pending_time_log_syncs():
+    """Sync the TimeLog of every pending student in one pass"""
+    from maths.models import TimeLog
+
+    with _time_log_lock:
+        student_ids = set(_pending_time_logs)
+        _pending_time_logs.clear()
+    if not student_ids:
+        return
+
+    @retry_on_db_lock(max_retries=5)
+    def sync():
+        TimeLog.sync_from_activity(student_ids)
+
+    try:
+        sync()
+    except Exception:
+        logger.exception("TimeLog sync failed for %d students", len(student_ids))
+        # Retry them with the next scheduled sync
+        with _time_log_lock:
+            _pending_time_logs.update(student_ids)
+
+
+def flush_time_log_syncs():
+    """Cancel the debounce timer and sync every pending TimeLog now"""
+    global _time_log_timer
+    with _time_log_lock:
+        timer, _time_log_timer = _time_log_timer, None
+    if timer is not None:
+        timer.cancel()
+    apply_pending_time_log_syncs()
+
+
+# The timer thread is a daemon, so syncs still waiting for it would be lost at shutdown
+atexit.register(flush_time_log_syncs)
+
+
+# Statistics changes waiting to be applied, keyed by background job key
+_pending_changes = defaultdict(list)
+_pending_changes_lock = threading.Lock()
+
+
+def _queue_change(job_key, change, apply_func, *args):
+    """
+    Queue a change for a statistics row and submit the job that applies it.
+    Changes with the same job key are coalesced, so a class finishing
+    together costs one statistics write per row, not one per student.
+    """
+    from maths.jobs import background_jobs
+
+    with _pending_changes_lock:
+        _pending_changes[job_key].append(change)
+
+    if not background_jobs.submit(job_key, apply_func, *args):
+        # Queue is full: apply on the caller's thread instead of dropping the change
+        apply_func(*args)
+
+
+def _take_pending_changes(job_key):
+    with _pending_changes_lock:
+        return _pending_changes.pop(job_key, [])
+
+
+def _requeue_changes(job_key, changes):
+    """Put changes whose write failed back in front of the queue, to be retried with the row's next change"""
+    with _pending_changes_lock:
+        _pending_changes[job_key][:0] = changes
+
+
+def schedule_best_change(level, topic, previous_best, new_best):
+    """Queue a student's best-result change for the topic-level statistics"""
+    _queue_change(
+        ('topic_statistics', level.pk, topic.pk), (previous_best, new_best),
+        apply_pending_best_changes, level.pk, topic.pk
     )
-    
-    StudentFinalAnswer.objects.update_or_create(
-        student=student,
-        session_id=session_id,
-        defaults={
-            'topic': topic,
-            'level': level,
-            'attempt_number': attempt_number,
-            'points_earned': points_earned,
-        }
+
+
+def apply_pending_best_changes(level_id, topic_id):
+    """Apply all queued best-result changes for one topic-level in a single write"""
+    from maths.models import TopicLevelStatistics
+
+    job_key = ('topic_statistics', level_id, topic_id)
+    changes = _take_pending_changes(job_key)
+    if not changes:
+        return
+
+    @retry_on_db_lock(max_retries=5)
+    def record():
+        return TopicLevelStatistics.record_best_changes(level_id, topic_id, changes)
+
+    try:
+        stats = record()
+    except Exception:
+        # The recompute_topic_statistics command repairs the row if the retry never comes
+        logger.exception("Topic statistics update failed for level %s topic %s", level_id, topic_id)
+        _requeue_changes(job_key, changes)
+        return
+
+    if stats.sketch_needs_rebuild():
+        schedule_sketch_rebuild(level_id, topic_id)
+
+
+def schedule_sketch_rebuild(level_id, topic_id):
+    """Queue a rebuild of a topic-level's quantile sketch; repeated requests are coalesced"""
+    from maths.jobs import background_jobs
+
+    # If the queue is full the next improvement asks again
+    background_jobs.submit(('topic_statistics_sketch', level_id, topic_id), rebuild_sketch, level_id, topic_id)
+
+
+@retry_on_db_lock(max_retries=5)
+def rebuild_sketch(level_id, topic_id):
+    """Rebuild a topic-level's quantile sketch from current bests (background job)"""
+    from maths.models import TopicLevelStatistics
+
+    TopicLevelStatistics.rebuild_sketch(level_id, topic_id)
+
+
+def schedule_day_best_change(level, topic, previous_day_best, day_best):
+    """Queue a change to a student's best for today in the topic-level's daily bucket"""
+    from django.utils import timezone
+
+    today = timezone.localdate()
+    _queue_change(
+        ('daily_statistics', level.pk, topic.pk, today), (previous_day_best, day_best),
+        apply_pending_day_best_changes, level.pk, topic.pk, today
     )
 
+
+def apply_pending_day_best_changes(level_id, topic_id, date):
+    """Apply all queued day-best changes for one daily bucket in a single write"""
+    from maths.models import TopicLevelDailyStatistics
+
+    job_key = ('daily_statistics', level_id, topic_id, date)
+    changes = _take_pending_changes(job_key)
+    if not changes:
+        return
+
+    @retry_on_db_lock(max_retries=5)
+    def record():
+        TopicLevelDailyStatistics.record_day_best_changes(level_id, topic_id, date, changes)
+
+    try:
+        record()
+    except Exception:
+        # The rebuild_daily_statistics command repairs the bucket if the retry never comes
+        logger.exception("Daily statistics update failed for level %s topic %s on %s", level_id, topic_id, date)
+        _requeue_changes(job_key, changes)
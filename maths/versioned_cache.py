@@ -0,0 +1,49 @@
+"""
+Version counters for the per-process caches.
+
+The statistics map, catalog, answer keys and question pools are each kept in
+process memory and invalidated through a counter in Django's cache: writers
+bump the counter, and every process drops what it loaded when the counter no
+longer matches. Workers only see each other's bumps if CACHES uses a shared
+backend (see settings.CACHES); management commands that invalidate check
+cache_is_shared() and warn when it doesn't.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Backends whose data never leaves the process that wrote it
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    """Whether the default cache is visible to other processes (web workers)"""
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS
+
+
+class VersionedCache:
+    """Version counter stored in Django's cache under key"""
+
+    def __init__(self, key):
+        self.key = key
+
+    def get_version(self):
+        """Current version, initialising the counter if the cache has none"""
+        version = cache.get(self.key)
+        if version is None:
+            # Start from the clock so a restarted cache never reuses an old version
+            cache.add(self.key, int(time.time() * 1000), timeout=None)
+            version = cache.get(self.key)
+        return version
+
+    def invalidate(self):
+        """Mark the cached data stale in every process"""
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            # Counter was evicted; re-initialise it
+            self.get_version()
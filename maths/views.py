@@ -11,27 +11,21 @@ import sys
 import os
 import uuid
 from django.conf import settings
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 import time
 from django.db.models import Q, Count, Sum, Max, Min, Avg
 import random
 from datetime import datetime
 import json
-import threading
+from django.utils import timezone
 from django.utils.text import slugify
-from .models import Topic, Level, ClassRoom, Enrollment, CustomUser, Question, Answer, StudentAnswer, BasicFactsResult, TimeLog, TopicLevelStatistics, StudentFinalAnswer
+from .models import Topic, Level, ClassRoom, Enrollment, CustomUser, Question, Answer, StudentAnswer, AttemptAnswer, BasicFactsResult, TopicLevelStatistics, StudentTopicBest
 from .forms import CreateClassForm, StudentSignUpForm, TeacherSignUpForm, TeacherCenterRegistrationForm, IndividualStudentRegistrationForm, StudentBulkRegistrationForm, QuestionForm, AnswerFormSet, UserProfileForm, UserPasswordChangeForm
-from .constants import YEAR_TOPICS_MAP, TIMES_TABLES_BY_YEAR
-
-BASIC_FACTS_TOPIC_CONFIG = {
-    "addition": {"start_level": 100, "level_count": 7},
-    "subtraction": {"start_level": 107, "level_count": 7},
-    "multiplication": {"start_level": 114, "level_count": 7},
-    "division": {"start_level": 121, "level_count": 7},
-    "place-value-facts": {"start_level": 128, "level_count": 5},
-}
-
-YEAR_QUESTION_COUNTS = {1: 12, 2: 10, 3: 12, 4: 15, 5: 17, 6: 20, 7: 22, 8: 25, 9: 30}
+from .constants import YEAR_TOPICS_MAP, TIMES_TABLES_BY_YEAR, YEAR_QUESTION_COUNTS, BASIC_FACTS_TOPIC_CONFIG
+from .progress import get_student_progress, serialize_progress
+from .catalog import get_basic_facts_by_subtopic, group_year_levels
+from . import activity, answer_keys, question_payloads, question_pools
 
 TOPIC_SESSION_SLUGS = {
     "Measurements": "measurements",
@@ -78,39 +72,6 @@ def get_display_level_for_basic_facts(level_number, topic_name):
         return level_number - start + 1
     return None
 
-def calculate_age_from_dob(date_of_birth):
-    """
-    Calculate age from date of birth (integer years only, ignoring months).
-    For example: 6 years and 4 months -> returns 6
-    """
-    if not date_of_birth:
-        return None
-    from datetime import date
-    today = date.today()
-    # Calculate age in years only (integer, no rounding)
-    # If birthday hasn't occurred this year, subtract 1
-    age = today.year - date_of_birth.year
-    if (today.month, today.day) < (date_of_birth.month, date_of_birth.day):
-        age -= 1
-    return age
-
-
-def get_or_create_age_level(age):
-    """Get or create a Level object for a specific age (for Basic Facts statistics)"""
-    # Use level_number = 2000 + age to avoid conflicts with regular levels (2-9) and Basic Facts (100+)
-    age_level_number = 2000 + age
-    age_level, created = Level.objects.get_or_create(
-        level_number=age_level_number,
-        defaults={'title': f"Age {age}"}
-    )
-    return age_level
-
-def get_or_create_formatted_topic(level_number, topic_name):
-    """Get or create a Topic with formatted name for Basic Facts: {level_number}_{topic_name}"""
-    formatted_name = f"{level_number}_{topic_name}"
-    topic, created = Topic.objects.get_or_create(name=formatted_name)
-    return topic
-
 def select_questions_stratified(all_questions, num_needed):
     """
     Select questions using stratified random sampling.
@@ -176,319 +137,13 @@ def _clear_session_keys(session, *keys):
             del session[key]
 
 
-def _calculate_previous_best_points(student, level, topic, exclude_session_id):
-    previous_sessions_data = StudentAnswer.objects.filter(
-        student=student,
-        question__level=level,
-        question__topic=topic
-    ).exclude(session_id=exclude_session_id).exclude(session_id='').values('session_id').annotate(
-        total_correct=Sum('is_correct'),
-        total_count=Count('id'),
-        total_points=Sum('points_earned'),
-        time_taken=Max('time_taken_seconds')
-    )
-
-    previous_best_points = None
-    for session_data in previous_sessions_data:
-        sid = session_data['session_id']
-        if not sid:
-            continue
-
-        session_correct = session_data['total_correct'] or 0
-        session_total = session_data['total_count'] or 1
-        session_time = session_data['time_taken'] or 0
-        session_points_earned = session_data['total_points'] or 0
-
-        if session_time > 0:
-            session_percentage = (session_correct / session_total) if session_total else 0
-            session_points = (session_percentage * 100 * 60) / session_time if session_time else 0
-        else:
-            session_points = session_points_earned
-
-        if previous_best_points is None or session_points > previous_best_points:
-            previous_best_points = session_points
-
-    return previous_best_points
-
-def update_topic_statistics(level_num=None, topic_name=None):
-    """
-    Helper function to update topic-level statistics
-    This should be called when a student completes an exercise or beats their record
-    
-    For Basic Facts (level_number >= 100):
-    - Level is based on student's age (from date_of_birth)
-    - Topic is formatted as {level_number}_{topic_name} (e.g., "100_Addition")
-    """
-    try:
-        import math
-        from datetime import date
-        
-        # Separate Basic Facts and Year levels
-        year_answers = StudentAnswer.objects.filter(
-            question__topic__isnull=False,
-            question__level__level_number__lt=100  # Year levels (2-9)
-        ).select_related('question', 'question__level', 'question__topic', 'student')
-        
-        basic_facts_answers = StudentAnswer.objects.filter(
-            question__topic__isnull=False,
-            question__level__level_number__gte=100  # Basic Facts (>= 100)
-        ).select_related('question', 'question__level', 'question__topic', 'student')
-        
-        # Process Year levels (existing logic)
-        if level_num is None or level_num < 100:
-            # Filter by level if specified
-            if level_num is not None:
-                year_answers = year_answers.filter(question__level__level_number=level_num)
-            
-            # Filter by topic if specified
-            if topic_name is not None:
-                year_answers = year_answers.filter(question__topic__name=topic_name)
-            
-            # Get unique level-topic combinations for Year levels
-            unique_combinations = year_answers.values(
-                'question__level__level_number',
-                'question__topic__name'
-            ).distinct()
-            
-            
-            for combo in unique_combinations:
-                level_num_val = combo['question__level__level_number']
-                topic_name_val = combo['question__topic__name']
-                
-                try:
-                    level_obj = Level.objects.get(level_number=level_num_val)
-                    topic_obj = Topic.objects.filter(name=topic_name_val).first()
-                    
-                    if not topic_obj:
-                        continue
-                    
-                    # Get available questions count
-                    available_questions = Question.objects.filter(
-                        level=level_obj,
-                        topic=topic_obj
-                    ).count()
-                    
-                    standard_limit = YEAR_QUESTION_COUNTS.get(level_num_val, 10)
-                    question_limit = min(available_questions, standard_limit) if available_questions > 0 else standard_limit
-                    
-                    # Get all students who have completed this topic-level
-                    student_best_points = {}
-                    
-                    # Get all unique student-session combinations for this level-topic
-                    student_sessions = year_answers.filter(
-                        question__level__level_number=level_num_val,
-                        question__topic__name=topic_name_val
-                    ).values('student', 'session_id').distinct()
-                    
-                    for student_session in student_sessions:
-                        student_id = student_session['student']
-                        session_id = student_session['session_id']
-                        
-                        if not session_id:
-                            continue
-                        
-                        # Get all answers for this student-session combination
-                        session_answers = year_answers.filter(
-                            student_id=student_id,
-                            session_id=session_id,
-                            question__level__level_number=level_num_val,
-                            question__topic__name=topic_name_val
-                        )
-                        
-                        # Only count full attempts
-                        if session_answers.count() < question_limit:
-                            continue
-                        
-                        # Calculate points for this attempt
-                        first_answer = session_answers.first()
-                        if first_answer and first_answer.time_taken_seconds > 0:
-                            total_correct = sum(1 for a in session_answers if a.is_correct)
-                            total_questions = session_answers.count()
-                            time_seconds = first_answer.time_taken_seconds
-                            
-                            percentage = (total_correct / total_questions) if total_questions else 0
-                            final_points = (percentage * 100 * 60) / time_seconds if time_seconds else 0
-                        else:
-                            final_points = sum(a.points_earned for a in session_answers)
-                        
-                        # Track best points for each student
-                        if student_id not in student_best_points:
-                            student_best_points[student_id] = final_points
-                        else:
-                            student_best_points[student_id] = max(student_best_points[student_id], final_points)
-                    
-                    # Calculate statistics
-                    if len(student_best_points) >= 2:  # Need at least 2 students
-                        points_list = list(student_best_points.values())
-                        avg = sum(points_list) / len(points_list)
-                        
-                        # Calculate standard deviation
-                        variance = sum((x - avg) ** 2 for x in points_list) / len(points_list)
-                        sigma = math.sqrt(variance)
-                        
-                        # Update or create statistics record
-                        stats, created = TopicLevelStatistics.objects.get_or_create(
-                            level=level_obj,
-                            topic=topic_obj,
-                            defaults={
-                                'average_points': round(avg, 2),
-                                'sigma': round(sigma, 2),
-                                'student_count': len(student_best_points)
-                            }
-                        )
-                        
-                        if not created:
-                            stats.average_points = round(avg, 2)
-                            stats.sigma = round(sigma, 2)
-                            stats.student_count = len(student_best_points)
-                            stats.save()
-                except Exception:
-                    pass  # Skip errors for individual combinations
-        
-        # Process Basic Facts levels (group by age and formatted topic)
-        if level_num is None or level_num >= 100:
-            # Filter by level if specified
-            if level_num is not None:
-                basic_facts_answers = basic_facts_answers.filter(question__level__level_number=level_num)
-            
-            # Filter by topic if specified
-            if topic_name is not None:
-                basic_facts_answers = basic_facts_answers.filter(question__topic__name=topic_name)
-            
-            # Group Basic Facts by (age, level_number, topic_name)
-            # We need to process each combination of (student_age, question_level, question_topic)
-            from collections import defaultdict
-            age_level_topic_combinations = defaultdict(lambda: defaultdict(lambda: {'students': set(), 'sessions': []}))
-            
-            # Get all unique student-session combinations for Basic Facts
-            student_sessions = basic_facts_answers.values('student', 'session_id', 'question__level__level_number', 'question__topic__name').distinct()
-            
-            for student_session in student_sessions:
-                student_id = student_session['student']
-                session_id = student_session['session_id']
-                level_num_val = student_session['question__level__level_number']
-                topic_name_val = student_session['question__topic__name']
-                
-                if not session_id:
-                    continue
-                
-                # Get student to calculate age
-                try:
-                    student = CustomUser.objects.get(id=student_id)
-                    age = calculate_age_from_dob(student.date_of_birth)
-                    if not age:
-                        continue  # Skip if no date of birth
-                except CustomUser.DoesNotExist:
-                    continue
-                
-                # Format topic name: {level_number}_{topic_name}
-                formatted_topic_name = f"{level_num_val}_{topic_name_val}"
-                
-                # Store session info
-                age_level_topic_combinations[age][formatted_topic_name]['students'].add(student_id)
-                age_level_topic_combinations[age][formatted_topic_name]['sessions'].append({
-                    'student_id': student_id,
-                    'session_id': session_id,
-                    'level_number': level_num_val,
-                    'topic_name': topic_name_val
-                })
-            
-            # Process each age-topic combination
-            for age, topics_dict in age_level_topic_combinations.items():
-                for formatted_topic_name, data in topics_dict.items():
-                    # Get level_number and original topic_name from formatted name
-                    # Format is: {level_number}_{topic_name}
-                    parts = formatted_topic_name.rsplit('_', 1)
-                    if len(parts) != 2:
-                        continue
-                    level_num_val = int(parts[0])
-                    original_topic_name = parts[1]
-                    
-                    # Get or create age level and formatted topic
-                    age_level = get_or_create_age_level(age)
-                    formatted_topic = get_or_create_formatted_topic(level_num_val, original_topic_name)
-                    
-                    # Get available questions count (for the original level and topic)
-                    original_level = Level.objects.filter(level_number=level_num_val).first()
-                    original_topic = Topic.objects.filter(name=original_topic_name).first()
-                    
-                    if not original_level or not original_topic:
-                        continue
-                    
-                    available_questions = Question.objects.filter(
-                        level=original_level,
-                        topic=original_topic
-                    ).count()
-                    
-                    # Basic Facts typically have 10 questions per level
-                    question_limit = min(available_questions, 10) if available_questions > 0 else 10
-                    
-                    # Calculate best points for each student
-                    student_best_points = {}
-                    
-                    for session_info in data['sessions']:
-                        student_id = session_info['student_id']
-                        session_id = session_info['session_id']
-                        level_num_val = session_info['level_number']
-                        topic_name_val = session_info['topic_name']
-                        
-                        # Get all answers for this student-session combination
-                        session_answers = basic_facts_answers.filter(
-                            student_id=student_id,
-                            session_id=session_id,
-                            question__level__level_number=level_num_val,
-                            question__topic__name=topic_name_val
-                        )
-                        
-                        # Only count full attempts
-                        if session_answers.count() < question_limit:
-                            continue
-                        
-                        # Calculate points for this attempt
-                        first_answer = session_answers.first()
-                        if first_answer and first_answer.time_taken_seconds > 0:
-                            total_correct = sum(1 for a in session_answers if a.is_correct)
-                            total_questions = session_answers.count()
-                            time_seconds = first_answer.time_taken_seconds
-                            
-                            percentage = (total_correct / total_questions) if total_questions else 0
-                            final_points = (percentage * 100 * 60) / time_seconds if time_seconds else 0
-                        else:
-                            final_points = sum(a.points_earned for a in session_answers)
-                        
-                        # Track best points for each student
-                        if student_id not in student_best_points:
-                            student_best_points[student_id] = final_points
-                        else:
-                            student_best_points[student_id] = max(student_best_points[student_id], final_points)
-                    
-                    # Calculate statistics
-                    if len(student_best_points) >= 2:  # Need at least 2 students
-                        points_list = list(student_best_points.values())
-                        avg = sum(points_list) / len(points_list)
-                        
-                        # Calculate standard deviation
-                        variance = sum((x - avg) ** 2 for x in points_list) / len(points_list)
-                        sigma = math.sqrt(variance)
-                        
-                        # Update or create statistics record
-                        stats, created = TopicLevelStatistics.objects.get_or_create(
-                            level=age_level,
-                            topic=formatted_topic,
-                            defaults={
-                                'average_points': round(avg, 2),
-                                'sigma': round(sigma, 2),
-                                'student_count': len(student_best_points)
-                            }
-                        )
-                        
-                        if not created:
-                            stats.average_points = round(avg, 2)
-                            stats.sigma = round(sigma, 2)
-                            stats.student_count = len(student_best_points)
-                            stats.save()
-    except Exception:
-        pass  # Silently fail if statistics can't be updated
+def _basic_facts_best_before(student, level, session_id):
+    """Student's best Basic Facts points for a level excluding the given (latest) attempt"""
+    level_best = StudentTopicBest.objects.filter(student=student, level=level).first()
+    if level_best is None:
+        return None
+    best_before = level_best.best_before(session_id)
+    return float(best_before) if best_before is not None else None
 
 def signup_student(request):
     if request.method == "POST":
@@ -538,38 +193,14 @@ def dashboard(request):
         classes = request.user.classes.all()
         return render(request, "maths/teacher_dashboard.html", {"classes": classes})
     allowed = student_allowed_levels(request.user)
-    levels = allowed if allowed is not None else Level.objects.all()
-    
-    # Separate Basic Facts levels (>= 100) from Year levels (< 100)
-    # Basic Facts are always accessible to all students
-    basic_facts_levels = Level.objects.filter(level_number__gte=100)
-    year_levels = levels.filter(level_number__lt=100)
-    
-    # Group year levels by year and topics
-    levels_by_year = {}
-    for level in year_levels:
-        year = level.level_number
-        if year not in levels_by_year:
-            levels_by_year[year] = []
-        levels_by_year[year].append(level)
-    
-    # Sort years
-    sorted_years = sorted(levels_by_year.keys())
     
-    # Group Basic Facts levels by subtopic (Addition, Subtraction, etc.)
-    basic_facts_by_subtopic = {}
-    for level in basic_facts_levels:
-        # Get the subtopic (Addition, Subtraction, etc.)
-        subtopics = level.topics.filter(name__in=['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts'])
-        if subtopics.exists():
-            subtopic_name = subtopics.first().name
-            if subtopic_name not in basic_facts_by_subtopic:
-                basic_facts_by_subtopic[subtopic_name] = []
-            basic_facts_by_subtopic[subtopic_name].append(level)
-    
-    # Sort Basic Facts levels within each subtopic by level_number
-    for subtopic in basic_facts_by_subtopic:
-        basic_facts_by_subtopic[subtopic].sort(key=lambda x: x.level_number)
+    # Group year levels (< 100) by year, and Basic Facts levels (>= 100) by
+    # subtopic (Addition, Subtraction, etc.), from the in-memory catalog.
+    # Basic Facts are always accessible to all students.
+    levels_by_year, sorted_years = group_year_levels(
+        allowed.filter(level_number__lt=100) if allowed is not None else None
+    )
+    basic_facts_by_subtopic = get_basic_facts_by_subtopic()
     
     # Note: Progress calculation removed from home page - only shown on /dashboard/ page
     
@@ -577,7 +208,8 @@ def dashboard(request):
         "levels_by_year": levels_by_year,
         "sorted_years": sorted_years,
         "basic_facts_by_subtopic": basic_facts_by_subtopic,
-        "has_class": Enrollment.objects.filter(student=request.user).exists(),
+        # Students get a level queryset only when enrolled in a class
+        "has_class": allowed is not None,
         "progress_by_level": [],
         "show_progress_table": False,
         "show_all_content": True,
@@ -585,448 +217,59 @@ def dashboard(request):
     })
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=activity.page_etag, last_modified_func=activity.last_modified)
 def dashboard_detail(request):
     """Detailed dashboard view showing progress table"""
     if request.user.is_teacher:
         classes = request.user.classes.all()
         return render(request, "maths/teacher_dashboard.html", {"classes": classes})
     allowed = student_allowed_levels(request.user)
-    levels = allowed if allowed is not None else Level.objects.all()
-    
-    # Separate Basic Facts levels (>= 100) from Year levels (< 100)
-    basic_facts_levels = Level.objects.filter(level_number__gte=100)
-    year_levels = levels.filter(level_number__lt=100)
-    
-    # Group year levels by year and topics
-    levels_by_year = {}
-    for level in year_levels:
-        year = level.level_number
-        if year not in levels_by_year:
-            levels_by_year[year] = []
-        levels_by_year[year].append(level)
     
-    # Sort years
-    sorted_years = sorted(levels_by_year.keys())
-    
-    # Group Basic Facts levels by subtopic
-    basic_facts_by_subtopic = {}
-    for level in basic_facts_levels:
-        subtopics = level.topics.filter(name__in=['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts'])
-        if subtopics.exists():
-            subtopic_name = subtopics.first().name
-            if subtopic_name not in basic_facts_by_subtopic:
-                basic_facts_by_subtopic[subtopic_name] = []
-            basic_facts_by_subtopic[subtopic_name].append(level)
-    
-    for subtopic in basic_facts_by_subtopic:
-        basic_facts_by_subtopic[subtopic].sort(key=lambda x: x.level_number)
-    
-    # Calculate student progress by level (same as dashboard)
-    from django.db.models import Count, Min, Max, Avg, Sum
-    
-    # Get all student answers for all levels
-    student_answers = StudentAnswer.objects.filter(
-        student=request.user
-    ).select_related('question', 'question__level', 'question__topic')
-    
-    # Group by level, topic, and session_id to count attempts
-    # This allows us to show separate entries for Measurements and Place Values
-    progress_by_level = []
-    
-    # PRIMARY: Get all level-topic combinations from StudentFinalAnswer table
-    # This is the source of truth for completed quizzes
-    final_answer_combinations = StudentFinalAnswer.objects.filter(
-        student=request.user
-    ).values(
-        'level__level_number',
-        'topic__name'
-    ).distinct()
-    
-    # Build level_topic_data from StudentFinalAnswer (primary source)
-    level_topic_data = {}
-    for item in final_answer_combinations:
-        level_num = item['level__level_number']
-        topic_name = item['topic__name']
-        key = (level_num, topic_name)
-        if key not in level_topic_data:
-            level_topic_data[key] = set()
-    
-    # FALLBACK: Also get combinations from StudentAnswer (for records not yet in StudentFinalAnswer)
-    student_answers_with_topics = student_answers.filter(question__topic__isnull=False)
-    unique_level_topic_sessions = student_answers_with_topics.values(
-        'question__level__level_number', 
-        'question__topic__name',
-        'session_id'
-    ).distinct()
-    
-    # Add StudentAnswer combinations (only if not already in level_topic_data)
-    for item in unique_level_topic_sessions:
-        level_num = item['question__level__level_number']
-        topic_name = item['question__topic__name']
-        session_id = item['session_id']
-        
-        if not session_id or not topic_name:
-            continue
-        
-        key = (level_num, topic_name)
-        if key not in level_topic_data:
-            level_topic_data[key] = set()
-        level_topic_data[key].add(session_id)
-    
-    # Calculate stats for each level + topic combination
-    # PRIMARY: Use StudentFinalAnswer table (more efficient and accurate)
-    # FALLBACK: Use StudentAnswer records if no StudentFinalAnswer records exist
-    
-    for (level_num, topic_name), session_ids in level_topic_data.items():
-        attempts_data = []
-        completed_session_ids = []
-        
-        # Get level info
-        try:
-            level_obj = Level.objects.get(level_number=level_num)
-            level_name = f"Level {level_num}" if level_num >= 100 else f"Year {level_num}"
-        except Level.DoesNotExist:
-            level_obj = None
-            level_name = f"Level {level_num}"
-            topic_name = "Unknown"
-        
-        # Get topic object
-        topic_obj = Topic.objects.filter(name=topic_name).first() if level_obj else None
-        
-        # PRIMARY: Try to get results from StudentFinalAnswer table
-        if level_obj and topic_obj:
-            final_answer_records = StudentFinalAnswer.objects.filter(
-                student=request.user,
-                level=level_obj,
-                topic=topic_obj
-            ).order_by('-points_earned')
-            
-            if final_answer_records.exists():
-                # Use StudentFinalAnswer records
-                for fa in final_answer_records:
-                    # Look up time from StudentAnswer for this session
-                    session_time = 0
-                    sa_with_time = StudentAnswer.objects.filter(
-                        student=request.user,
-                        session_id=fa.session_id,
-                        time_taken_seconds__gt=0
-                    ).values_list('time_taken_seconds', flat=True).first()
-                    if sa_with_time:
-                        session_time = sa_with_time
-                    attempts_data.append({
-                        'points': float(fa.points_earned),
-                        'time_seconds': session_time,
-                        'date': fa.last_updated_time
-                    })
-                    completed_session_ids.append(fa.session_id)
-            else:
-                # FALLBACK: Use StudentAnswer records (old method)
-                # Get the actual number of questions available for this topic/level
-                try:
-                    available_questions = Question.objects.filter(
-                        level=level_obj,
-                        topic=topic_obj
-                    ).count()
-                except Exception:
-                    available_questions = 0
-                
-                # Use the minimum of: standard limit OR all available questions
-                standard_limit = YEAR_QUESTION_COUNTS.get(level_num, 10)
-                question_limit = min(available_questions, standard_limit) if available_questions > 0 else standard_limit
-                
-                # Allow partial results if they're close to the limit (90% or more)
-                partial_threshold = int(question_limit * 0.9)  # 90% of required questions
-                
-                # Remove duplicates from session_ids
-                unique_session_ids = list(set(session_ids))
-                
-                for session_id in unique_session_ids:
-                    # Filter by level, topic, and session_id directly
-                    session_answers = student_answers_with_topics.filter(
-                        session_id=session_id,
-                        question__level__level_number=level_num,
-                        question__topic__name=topic_name
-                    )
-                    
-                    # Count attempts that meet the full limit OR are close to it (partial threshold)
-                    answer_count = session_answers.count()
-                    if answer_count < partial_threshold:
-                        continue
-                    completed_session_ids.append(session_id)
-                    
-                    # Calculate points using the formula: percentage * 100 * 60 / time_seconds
-                    first_answer = session_answers.first()
-                    if first_answer and first_answer.time_taken_seconds > 0:
-                        total_correct = sum(1 for a in session_answers if a.is_correct)
-                        total_questions = session_answers.count()
-                        time_seconds = first_answer.time_taken_seconds
-                        
-                        percentage = (total_correct / total_questions) if total_questions else 0
-                        final_points = (percentage * 100 * 60) / time_seconds if time_seconds else 0
-                        attempts_data.append({
-                            'points': round(final_points, 2),
-                            'time_seconds': time_seconds,
-                            'date': first_answer.answered_at
-                        })
-                    else:
-                        total_points = sum(a.points_earned for a in session_answers)
-                        first_answer_date = first_answer.answered_at if first_answer else None
-                        attempts_data.append({
-                            'points': total_points,
-                            'time_seconds': 0,
-                            'date': first_answer_date
-                        })
-        
-        if attempts_data:
-            points_list = [a['points'] for a in attempts_data]
-            best_score = max(points_list)
-            best_attempt = max(attempts_data, key=lambda x: x['points'])
-            
-            # Try to get best result from StudentFinalAnswer table (more efficient)
-            best_result = None
-            try:
-                if level_obj:
-                    if level_num < 100:
-                        # Year levels: use level and topic directly
-                        topic_obj = Topic.objects.filter(name=topic_name).first()
-                        if topic_obj:
-                            best_result = StudentFinalAnswer.get_best_result(
-                                student=request.user,
-                                topic=topic_obj,
-                                level=level_obj
-                            )
-                            if best_result:
-                                best_score = float(best_result.points_earned)
-                    else:
-                        # Basic Facts: use age-based level and formatted topic
-                        age = calculate_age_from_dob(request.user.date_of_birth)
-                        if age:
-                            age_level = get_or_create_age_level(age)
-                            formatted_topic = get_or_create_formatted_topic(level_num, topic_name)
-                            if age_level and formatted_topic:
-                                best_result = StudentFinalAnswer.get_best_result(
-                                    student=request.user,
-                                    topic=formatted_topic,
-                                    level=age_level
-                                )
-                                if best_result:
-                                    best_score = float(best_result.points_earned)
-            except Exception:
-                pass  # Fallback to calculated best_score if StudentFinalAnswer lookup fails
-            
-            # Get statistics for this topic-level to determine color
-            color_class = 'light-green'  # Default color
-            try:
-                if level_obj:
-                    if level_num < 100:
-                        # Year levels: use level and topic directly
-                        topic_obj = Topic.objects.filter(name=topic_name).first()
-                        if topic_obj:
-                            stats = TopicLevelStatistics.objects.filter(
-                                level=level_obj,
-                                topic=topic_obj
-                            ).first()
-                            if stats:
-                                color_class = stats.get_color_class(best_score)
-                    elif level_num >= 100:
-                        # Basic Facts: use age-based level and formatted topic
-                        # Calculate student's age
-                        age = calculate_age_from_dob(request.user.date_of_birth)
-                        if age:
-                            # Format topic as {level_number}_{topic_name}
-                            formatted_topic_name = f"{level_num}_{topic_name}"
-                            formatted_topic = Topic.objects.filter(name=formatted_topic_name).first()
-                            if formatted_topic:
-                                # Get age level (2000 + age)
-                                age_level = Level.objects.filter(level_number=2000 + age).first()
-                                if age_level:
-                                    stats = TopicLevelStatistics.objects.filter(
-                                        level=age_level,
-                                        topic=formatted_topic
-                                    ).first()
-                                    if stats:
-                                        color_class = stats.get_color_class(best_score)
-            except Exception:
-                pass  # If statistics don't exist, use default color
-            
-            progress_by_level.append({
-                'level_number': level_num,
-                'level_name': level_name,
-                'topic_name': topic_name,
-                'total_attempts': len(completed_session_ids),
-                'best_points': best_score,
-                'best_time_seconds': best_attempt['time_seconds'],
-                'best_date': best_attempt['date'],
-                'min_points': min(points_list),
-                'max_points': max(points_list),
-                'avg_points': round(sum(points_list) / len(points_list), 1),
-                'color_class': color_class
-            })
-    
-    # Sort by level number
-    progress_by_level.sort(key=lambda x: x['level_number'])
-    
-    # Get Basic Facts progress from database
-    basic_facts_progress = {}
-    for subtopic_name, levels in basic_facts_by_subtopic.items():
-        basic_facts_progress[subtopic_name] = []
-        for level in levels:
-            level_num = level.level_number
-            
-            # Get all attempts from database for this level
-            db_results = BasicFactsResult.objects.filter(
-                student=request.user,
-                level=level
-            ).order_by('-points')
-            
-            if db_results.exists():
-                # Get best result (highest points)
-                best_result = db_results.first()
-                
-                display_level = level_num
-                if 100 <= level_num <= 106:  # Addition
-                    display_level = level_num - 99
-                elif 107 <= level_num <= 113:  # Subtraction
-                    display_level = level_num - 106
-                elif 114 <= level_num <= 120:  # Multiplication
-                    display_level = level_num - 113
-                elif 121 <= level_num <= 127:  # Division
-                    display_level = level_num - 120
-                elif 128 <= level_num <= 132:  # Place Value Facts
-                    display_level = level_num - 127
-                
-                # Count total attempts (unique sessions)
-                total_attempts = db_results.values('session_id').distinct().count()
-                
-                # Get color class for Basic Facts based on age and formatted topic
-                color_class = 'light-green'  # Default color
-                try:
-                    # Calculate student's age
-                    age = calculate_age_from_dob(request.user.date_of_birth)
-                    if age:
-                        # Get the topic name from the level's topics (Addition, Subtraction, etc.)
-                        subtopics = level.topics.filter(name__in=['Addition', 'Subtraction', 'Multiplication', 'Division', 'Place Value Facts'])
-                        if subtopics.exists():
-                            topic_name = subtopics.first().name
-                            # Format topic as {level_number}_{topic_name}
-                            formatted_topic_name = f"{level_num}_{topic_name}"
-                            formatted_topic = Topic.objects.filter(name=formatted_topic_name).first()
-                            if formatted_topic:
-                                # Get age level (2000 + age)
-                                age_level = Level.objects.filter(level_number=2000 + age).first()
-                                if age_level:
-                                    stats = TopicLevelStatistics.objects.filter(
-                                        level=age_level,
-                                        topic=formatted_topic
-                                    ).first()
-                                    if stats:
-                                        color_class = stats.get_color_class(float(best_result.points))
-                except Exception:
-                    pass  # If statistics don't exist, use default color
-                
-                basic_facts_progress[subtopic_name].append({
-                    'display_level': display_level,
-                    'level_number': level_num,
-                    'best_points': float(best_result.points),
-                    'best_time_seconds': best_result.time_taken_seconds,
-                    'best_date': best_result.completed_at,
-                    'total_attempts': total_attempts,
-                    'color_class': color_class  # Add color class for Basic Facts
-                })
-            else:
-                # Check session for old data (for migration/backward compatibility)
-                results_key = f"basic_facts_results_{request.user.id}_{level_num}"
-                results_list = request.session.get(results_key, [])
-                
-                if results_list:
-                    # Migrate session data to database (one-time migration)
-                    try:
-                        for result_entry in results_list:
-                            # Fix old format points if needed
-                            points = result_entry.get('points', 0)
-                            if points > 100:
-                                points = points / 10
-                            
-                            # Check if this session_id already exists in DB
-                            session_id = result_entry.get('session_id', '')
-                            if session_id and not BasicFactsResult.objects.filter(
-                                student=request.user,
-                                level=level,
-                                session_id=session_id
-                            ).exists():
-                                # Migrate to database
-                                date_str = result_entry.get('date', '')
-                                if isinstance(date_str, str):
-                                    try:
-                                        completed_date = datetime.fromisoformat(date_str)
-                                    except:
-                                        from django.utils import timezone
-                                        completed_date = timezone.now()
-                                else:
-                                    from django.utils import timezone
-                                    completed_date = date_str if date_str else timezone.now()
-                                
-                                BasicFactsResult.objects.create(
-                                    student=request.user,
-                                    level=level,
-                                    session_id=session_id,
-                                    score=result_entry.get('score', 0),
-                                    total_points=result_entry.get('total_points', 10),
-                                    time_taken_seconds=result_entry.get('time_taken_seconds', 0),
-                                    points=points,
-                                    completed_at=completed_date
-                                )
-                        
-                        # After migration, get from database again
-                        db_results = BasicFactsResult.objects.filter(
-                            student=request.user,
-                            level=level
-                        ).order_by('-points')
-                        
-                        if db_results.exists():
-                            best_result = db_results.first()
-                            display_level = level_num
-                            if 100 <= level_num <= 106:
-                                display_level = level_num - 99
-                            elif 107 <= level_num <= 113:
-                                display_level = level_num - 106
-                            elif 114 <= level_num <= 120:
-                                display_level = level_num - 113
-                            elif 121 <= level_num <= 127:
-                                display_level = level_num - 120
-                            elif 128 <= level_num <= 132:
-                                display_level = level_num - 127
-                            
-                            total_attempts = db_results.values('session_id').distinct().count()
-                            
-                            basic_facts_progress[subtopic_name].append({
-                                'display_level': display_level,
-                                'level_number': level_num,
-                                'best_points': float(best_result.points),
-                                'best_time_seconds': best_result.time_taken_seconds,
-                                'best_date': best_result.completed_at,
-                                'total_attempts': total_attempts
-                            })
-                    except Exception as e:
-                        # If migration fails, fall back to session display
-                        pass
-        
-        # Sort by display_level
-        basic_facts_progress[subtopic_name].sort(key=lambda x: x['display_level'])
+    # Group year levels (< 100) by year from the in-memory catalog
+    levels_by_year, sorted_years = group_year_levels(
+        allowed.filter(level_number__lt=100) if allowed is not None else None
+    )
     
+    # The progress tables are fetched asynchronously from progress_api, so the
+    # page shell doesn't wait on the student's history
     return render(request, "maths/student_dashboard.html", {
         "levels_by_year": levels_by_year,
         "sorted_years": sorted_years,
-        "basic_facts_by_subtopic": basic_facts_by_subtopic,
-        "basic_facts_progress": basic_facts_progress,
-        "has_class": Enrollment.objects.filter(student=request.user).exists(),
-        "progress_by_level": progress_by_level,
+        # Students get a level queryset only when enrolled in a class
+        "has_class": allowed is not None,
         "show_progress_table": True,
         "show_all_content": False,
         "year_topics_map": YEAR_TOPICS_MAP
     })
 
 @login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=activity.progress_etag, last_modified_func=activity.last_modified)
+def progress_api(request):
+    """
+    JSON progress for the current student: topic rows grouped by level and
+    Basic Facts rows grouped by subtopic. ?level=N returns only that level's
+    topic rows. Used by the dashboard to load its tables asynchronously.
+    """
+    if request.user.is_teacher:
+        return JsonResponse({'error': 'Not authorized'}, status=403)
+    
+    year = request.GET.get('level')
+    if year is not None:
+        try:
+            year = int(year)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid level'}, status=400)
+    
+    # Progress snapshot, cached per student until their results change (see maths.progress)
+    progress = get_student_progress(request.user)
+    return JsonResponse({'success': True, **serialize_progress(progress, year=year)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=activity.page_etag, last_modified_func=activity.last_modified)
 def measurements_progress(request, level_number):
     """Show detailed measurements progress with attempt history and graph"""
     level = get_object_or_404(Level, level_number=level_number)
@@ -1037,49 +280,41 @@ def measurements_progress(request, level_number):
         messages.error(request, "You don't have access to this level.")
         return redirect("maths:dashboard")
     
-    # Get all student answers for Measurements topic for this level
-    student_answers = StudentAnswer.objects.filter(
-        student=request.user,
-        question__level=level,
-        question__level__topics__name="Measurements"
-    ).select_related('question', 'question__level').order_by('answered_at')
-    
     question_limit = YEAR_QUESTION_COUNTS.get(level_number, 10)
     
-    # Get unique session IDs for this level
-    unique_sessions = student_answers.values_list('session_id', flat=True).distinct()
-    unique_sessions = [s for s in unique_sessions if s]  # Filter out empty strings
+    # One row per logged Measurements attempt at this level
+    sessions = AttemptAnswer.objects.filter(
+        student=request.user,
+        level=level,
+        topic__name="Measurements"
+    ).values('session_id').annotate(
+        answer_count=Count('id'),
+        correct_count=Count('id', filter=Q(is_correct=True)),
+        points_total=Sum('points_earned'),
+        time_taken=Max('time_taken_seconds'),
+        first_answered_at=Min('answered_at'),
+    ).order_by()
     
     # Build attempt history
     attempt_history = []
-    for session_id in unique_sessions:
-        session_answers = student_answers.filter(session_id=session_id)
-        
+    for session in sessions:
         # Only count completed attempts
-        if session_answers.count() != question_limit:
+        if session['answer_count'] != question_limit:
             continue
         
         # Calculate points for this attempt
-        first_answer = session_answers.first()
-        if first_answer and first_answer.time_taken_seconds > 0:
-            total_correct = sum(1 for a in session_answers if a.is_correct)
-            total_questions = session_answers.count()
-            time_seconds = first_answer.time_taken_seconds
-            
-            percentage = (total_correct / total_questions) if total_questions else 0
-            final_points = (percentage * 100 * 60) / time_seconds if time_seconds else 0
+        if session['time_taken'] > 0:
+            percentage = session['correct_count'] / session['answer_count']
+            final_points = (percentage * 100 * 60) / session['time_taken']
             points = round(final_points, 2)
         else:
-            points = sum(a.points_earned for a in session_answers)
-        
-        # Get attempt date
-        attempt_date = session_answers.first().answered_at if session_answers.exists() else None
+            points = session['points_total']
         
         attempt_history.append({
-            'session_id': session_id,
+            'session_id': session['session_id'],
             'attempt_number': len(attempt_history) + 1,
             'points': points,
-            'date': attempt_date
+            'date': session['first_answered_at']
         })
     
     # Sort by date
@@ -1280,126 +515,84 @@ def user_profile(request):
         "user": user
     })
 
-def get_or_create_time_log(user):
-    """Get or create TimeLog for user and handle resets (using local time)"""
-    from django.utils.timezone import localtime
-    time_log, created = TimeLog.objects.get_or_create(student=user)
-    if created:
-        # Initialize with current date/week (local time)
-        from django.utils import timezone
-        now_local = localtime(timezone.now())
-        time_log.last_reset_date = now_local.date()
-        time_log.last_reset_week = now_local.isocalendar()[1]
-        time_log.save()
-    else:
-        # Check and reset if needed
-        time_log.reset_daily_if_needed()
-        time_log.reset_weekly_if_needed()
-    return time_log
-
-def update_time_log_from_activities(user):
-    """Update TimeLog by summing time from all completed activities (using local time)"""
-    from django.utils import timezone
-    from django.utils.timezone import localtime
-    from django.db.models import Sum
-    from datetime import timedelta
-    
-    time_log = get_or_create_time_log(user)
-    
-    # Get today's date for filtering (local time)
-    now_local = localtime(timezone.now())
-    today = now_local.date()
-    
-    # Get current week (ISO week number) in local time
-    current_week = now_local.isocalendar()[1]
-    
-    # Sum time from StudentAnswer records (regular quizzes and measurements)
-    # Only count completed sessions (where time_taken_seconds > 0)
-    # Note: answered_at is stored in UTC, so we need to filter by local date
-    daily_student_answers = StudentAnswer.objects.filter(
-        student=user,
-        time_taken_seconds__gt=0
-    )
-    
-    # For daily: sum unique session times (each session represents one activity)
-    # Filter by local date by converting UTC to local time
-    daily_time_from_student_answers = 0
-    seen_sessions = set()
-    for answer in daily_student_answers.order_by('session_id', 'answered_at'):
-        # Convert UTC to local time for date comparison
-        answer_local = localtime(answer.answered_at)
-        if answer_local.date() == today:
-            if answer.session_id and answer.session_id not in seen_sessions:
-                seen_sessions.add(answer.session_id)
-                daily_time_from_student_answers += answer.time_taken_seconds
-    
-    # For weekly: same logic but for current week (local time)
-    weekly_time_from_student_answers = 0
-    seen_weekly_sessions = set()
-    # Get start of week (Monday) in local time
-    days_since_monday = now_local.weekday()
-    week_start = now_local.date() - timedelta(days=days_since_monday)
-    
-    for answer in daily_student_answers.order_by('session_id', 'answered_at'):
-        # Convert UTC to local time for date comparison
-        answer_local = localtime(answer.answered_at)
-        if answer_local.date() >= week_start:
-            if answer.session_id and answer.session_id not in seen_weekly_sessions:
-                seen_weekly_sessions.add(answer.session_id)
-                weekly_time_from_student_answers += answer.time_taken_seconds
-    
-    # Sum time from BasicFactsResult records (also stored in UTC)
-    all_basic_facts = BasicFactsResult.objects.filter(student=user)
-    
-    daily_basic_facts = 0
-    seen_daily_sessions = set()
-    weekly_basic_facts = 0
-    seen_weekly_bf_sessions = set()
-    
-    for result in all_basic_facts:
-        # Convert UTC to local time for date comparison
-        result_local = localtime(result.completed_at)
-        result_date = result_local.date()
-        
-        # Daily check
-        if result_date == today:
-            if result.session_id and result.session_id not in seen_daily_sessions:
-                seen_daily_sessions.add(result.session_id)
-                daily_basic_facts += result.time_taken_seconds
-        
-        # Weekly check
-        if result_date >= week_start:
-            if result.session_id and result.session_id not in seen_weekly_bf_sessions:
-                seen_weekly_bf_sessions.add(result.session_id)
-                weekly_basic_facts += result.time_taken_seconds
-    
-    # Update TimeLog with total time from activities
-    time_log.daily_total_seconds = daily_time_from_student_answers + daily_basic_facts
-    time_log.weekly_total_seconds = weekly_time_from_student_answers + weekly_basic_facts
-    time_log.save(update_fields=['daily_total_seconds', 'weekly_total_seconds', 'last_activity'])
-    
-    return time_log
-
 @login_required
 @require_http_methods(["GET", "POST"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=activity.time_log_etag, last_modified_func=activity.time_log_last_modified)
 def update_time_log(request):
     """AJAX endpoint to get current time log (calculated from activities)"""
     if not request.user.is_authenticated or request.user.is_teacher:
         return JsonResponse({'error': 'Not authorized'}, status=401)
     
     try:
-        # Recalculate time from activities
-        time_log = update_time_log_from_activities(request.user)
+        # Read-only: totals come from the daily activity rollup (at most 7 rows),
+        # cached until the student's next attempt (see activity.get_time_totals)
+        daily_seconds, weekly_seconds = activity.get_time_totals(request.user)
+        
+        # Lets the page re-fetch when the totals reset at local midnight. An
+        # absolute time keeps the body valid for the whole day (it is served
+        # from the browser cache on a 304)
+        from datetime import timedelta
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        next_midnight = timezone.make_aware(datetime.combine(tomorrow, datetime.min.time()))
         
-        # Always return current time calculated from activities
         return JsonResponse({
             'success': True,
-            'daily_seconds': time_log.daily_total_seconds,
-            'weekly_seconds': time_log.weekly_total_seconds
+            'daily_seconds': daily_seconds,
+            'weekly_seconds': weekly_seconds,
+            'rollover_at': int(next_midnight.timestamp() * 1000)
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@login_required
+def topic_statistics_report(request):
+    """Teacher view of each Year topic-level's statistics: all time, the rolling
+    windows and an optional date range (e.g. this term), read from the daily buckets"""
+    if not request.user.is_teacher:
+        return redirect("maths:dashboard")
+
+    from datetime import date
+    from .models import ROLLING_WINDOW_DAYS, TopicLevelDailyStatistics
+
+    # Basic Facts statistics are kept per age bucket, not per Year level
+    all_time = list(
+        TopicLevelStatistics.objects.filter(level__level_number__lt=100).select_related('level', 'topic')
+    )
+    level_ids = {stats.level_id for stats in all_time}
+    windows = [
+        (f"Last {days} days", TopicLevelDailyStatistics.rolling(days, level_ids=level_ids))
+        for days in ROLLING_WINDOW_DAYS
+    ]
+
+    range_start = range_end = None
+    try:
+        if request.GET.get('start'):
+            range_start = date.fromisoformat(request.GET['start'])
+            range_end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+    except ValueError:
+        messages.error(request, "Dates must be in YYYY-MM-DD format.")
+        range_start = range_end = None
+    if range_start:
+        windows.append((
+            f"{range_start:%d %b %Y} – {range_end:%d %b %Y}",
+            TopicLevelDailyStatistics.summarize(range_start, range_end, level_ids=level_ids),
+        ))
+
+    rows = [{
+        'level': stats.level,
+        'topic': stats.topic,
+        'all_time': stats,
+        'windows': [summaries.get((stats.level_id, stats.topic_id)) for _, summaries in windows],
+    } for stats in all_time]
+
+    return render(request, "maths/topic_statistics.html", {
+        "rows": rows,
+        "window_labels": [label for label, _ in windows],
+        "range_start": range_start,
+        "range_end": range_end,
+    })
+
 @login_required
 def add_question(request, level_number):
     """Add a new question to a specific level"""
@@ -1828,7 +1021,6 @@ def take_quiz(request, level_number):
     
     # Check if there's a recently completed quiz (within last 30 seconds) to show results on refresh
     if is_basic_facts and request.method == "GET":
-        from django.utils import timezone
         from datetime import timedelta
         recent_result = BasicFactsResult.objects.filter(
             student=request.user,
@@ -1845,12 +1037,7 @@ def take_quiz(request, level_number):
             time_since_completion = timezone.now() - completed_at
             if time_since_completion.total_seconds() < 30:
                 # Show completion screen with stored results
-                previous_results = BasicFactsResult.objects.filter(
-                    student=request.user,
-                    level=level
-                ).exclude(session_id=recent_result.session_id).order_by('-points')
-                
-                previous_best_points = float(previous_results.first().points) if previous_results.exists() else None
+                previous_best_points = _basic_facts_best_before(request.user, level, recent_result.session_id)
                 beat_record = previous_best_points is not None and float(recent_result.points) > previous_best_points
                 is_first_attempt = previous_best_points is None
                 
@@ -1948,7 +1135,6 @@ def take_quiz(request, level_number):
     if request.method == "POST":
         # Check if quiz was already completed (prevent duplicate submissions)
         if is_basic_facts:
-            from django.utils import timezone
             from datetime import timedelta
             recent_result = BasicFactsResult.objects.filter(
                 student=request.user,
@@ -1964,12 +1150,7 @@ def take_quiz(request, level_number):
                 time_since_completion = timezone.now() - completed_at
                 if time_since_completion.total_seconds() < 5:
                     # This is likely a duplicate submission, show the existing result
-                    previous_results = BasicFactsResult.objects.filter(
-                        student=request.user,
-                        level=level
-                    ).exclude(session_id=recent_result.session_id).order_by('-points')
-                    
-                    previous_best_points = float(previous_results.first().points) if previous_results.exists() else None
+                    previous_best_points = _basic_facts_best_before(request.user, level, recent_result.session_id)
                     beat_record = previous_best_points is not None and float(recent_result.points) > previous_best_points
                     is_first_attempt = previous_best_points is None
                     
@@ -2043,7 +1224,9 @@ def take_quiz(request, level_number):
                                 'is_correct': is_correct,
                                 'points_earned': question.points if is_correct else 0,
                                 'session_id': session_id,
-                                'time_taken_seconds': time_taken_seconds
+                                'time_taken_seconds': time_taken_seconds,
+                                # answered_at is auto_now_add; keep it current when a retake overwrites the row
+                                'answered_at': timezone.now()
                             }
                         )
                     except Answer.DoesNotExist:
@@ -2056,41 +1239,17 @@ def take_quiz(request, level_number):
             final_points_calc = ((percentage * 100 * 60) / time_taken_seconds) / 10 if time_taken_seconds else 0
             final_points_calc = round(final_points_calc, 2)
             
-            # Save to database with retry logic
-            from maths.utils import retry_on_db_lock
-            
-            @retry_on_db_lock(max_retries=5)
-            def save_basic_facts_result():
-                BasicFactsResult.objects.create(
-                    student=request.user,
-                    level=level,
-                    session_id=session_id,
-                    score=score,
-                    total_points=total_points,
-                    time_taken_seconds=time_taken_seconds,
-                    points=final_points_calc
-                )
-            
-            save_basic_facts_result()
-            
-            # Update time log from activities
-            if not request.user.is_teacher:
-                update_time_log_from_activities(request.user)
-            
-            # Also keep in session for backward compatibility (optional)
-            basic_facts_results_key = f"basic_facts_results_{request.user.id}_{level_number}"
-            results_list = request.session.get(basic_facts_results_key, [])
-            from django.utils import timezone
-            result_entry = {
-                'session_id': session_id,
-                'score': score,
-                'total_points': total_points,
-                'time_taken_seconds': time_taken_seconds,
-                'points': final_points_calc,
-                'date': timezone.now().isoformat()
-            }
-            results_list.append(result_entry)
-            request.session[basic_facts_results_key] = results_list
+            # Save to database with retry logic (also updates the student's best record)
+            from maths.utils import save_basic_facts_result
+            previous_best_points = save_basic_facts_result(
+                student=request.user,
+                level=level,
+                session_id=session_id,
+                score=score,
+                total_points=total_points,
+                time_taken_seconds=time_taken_seconds,
+                points=final_points_calc
+            )
             
             # Clear questions from session
             if session_questions_key in request.session:
@@ -2100,9 +1259,6 @@ def take_quiz(request, level_number):
         if timer_session_key in request.session:
             del request.session[timer_session_key]
         
-        # Update time log from activities (for both Basic Facts and regular quizzes)
-        if not request.user.is_teacher:
-            update_time_log_from_activities(request.user)
         
         # Calculate points using the formula: percentage * 100 * 60 / time_seconds
         # For Basic Facts, divide by 10
@@ -2113,76 +1269,30 @@ def take_quiz(request, level_number):
             final_points = (percentage * 100 * 60) / time_taken_seconds if time_taken_seconds else 0
         final_points = round(final_points, 2)
         
-        # Compute previous best record for this level
-        if is_basic_facts:
-            # For Basic Facts, check database for previous results (excluding current session)
-            previous_results = BasicFactsResult.objects.filter(
-                student=request.user,
-                level=level
-            ).exclude(session_id=session_id).order_by('-points')
+        # Add the attempt to the student's activity and time log (for both Basic Facts and regular quizzes)
+        if not request.user.is_teacher:
+            from maths.utils import record_activity
+            record_activity(request.user, time_taken_seconds, final_points)
+        
+        # Previous best record for this level (Basic Facts was saved above)
+        if not is_basic_facts:
+            # Get or create "Quiz" topic for mixed quizzes
+            quiz_topic, _ = Topic.objects.get_or_create(name="Quiz")
             
-            if previous_results.exists():
-                previous_best_points = float(previous_results.first().points)
-            else:
-                previous_best_points = None
-        else:
-            # For regular levels, save to StudentFinalAnswer with "Quiz" topic
-            if not is_basic_facts:
-                # Get or create "Quiz" topic for mixed quizzes
-                quiz_topic, _ = Topic.objects.get_or_create(name="Quiz")
-                
-                # Save to StudentFinalAnswer table with retry logic
-                from maths.utils import save_student_final_answer
-                save_student_final_answer(
-                    student=request.user,
-                    session_id=session_id,
-                    topic=quiz_topic,
-                    level=level,
-                    points_earned=final_points
-                )
-                
-                # Update topic statistics asynchronously
-                def update_stats_async():
-                    try:
-                        update_topic_statistics(level_num=level.level_number, topic_name="Quiz")
-                    except Exception:
-                        pass
-                
-                thread = threading.Thread(target=update_stats_async)
-                thread.daemon = True
-                thread.start()
+            # Append this attempt's answers to the answer log
+            from maths.utils import save_attempt_answers, save_student_final_answer
+            save_attempt_answers(request.user, session_id)
             
-            # For regular levels, check database records - optimized with aggregation
-            previous_sessions_data = StudentAnswer.objects.filter(
+            # Save to StudentFinalAnswer table with retry logic
+            previous_best_points = save_student_final_answer(
                 student=request.user,
-                question__level=level
-            ).exclude(session_id=session_id).exclude(session_id='').values('session_id').annotate(
-                total_correct=Sum('is_correct'),
-                total_count=Count('id'),
-                total_points=Sum('points_earned'),
-                time_taken=Max('time_taken_seconds')
+                session_id=session_id,
+                topic=quiz_topic,
+                level=level,
+                points_earned=final_points,
+                time_taken_seconds=time_taken_seconds
             )
 
-            previous_best_points = None
-            for session_data in previous_sessions_data:
-                session_id_val = session_data['session_id']
-                if not session_id_val:
-                    continue
-                
-                session_correct = session_data['total_correct'] or 0
-                session_total = session_data['total_count'] or 1
-                session_time = session_data['time_taken'] or 0
-                session_points_earned = session_data['total_points'] or 0
-                
-                if session_time > 0:
-                    session_percentage = (session_correct / session_total) if session_total else 0
-                    session_points = (session_percentage * 100 * 60) / session_time if session_time else 0
-                else:
-                    session_points = session_points_earned
-                
-                if previous_best_points is None or session_points > previous_best_points:
-                    previous_best_points = session_points
-
         # For Basic Facts, show completion screen like measurements
         if is_basic_facts:
             beat_record = previous_best_points is not None and final_points > previous_best_points
@@ -2317,69 +1427,150 @@ def practice_questions(request, level_number):
 
 
 
+def _questions_session_key(topic_name):
+    """Session key holding the ids of the questions served in the student's current quiz on a topic"""
+    return f"{TOPIC_SESSION_SLUGS.get(topic_name, slugify(topic_name))}_question_ids"
+
+
+def _can_answer(request, keys):
+    """Whether the user may answer the questions with these answer keys.
+    Questions served in their current quiz were checked when it was served,
+    so only other questions cost an access query."""
+    level_ids = {
+        key['level_id'] for question_id, key in keys.items()
+        if question_id not in request.session.get(_questions_session_key(key['topic_name']), ())
+    }
+    if not level_ids:
+        return True
+    allowed = student_allowed_levels(request.user)
+    return allowed is None or allowed.filter(pk__in=level_ids).count() == len(level_ids)
+
+
+def _grade_topic_answer(question_id, key, answer_id, text_answer):
+    """Grade an answer from the question's answer key. Returns (unsaved
+    StudentAnswer, feedback for the client), or None if the answer is invalid."""
+    if answer_id:
+        try:
+            answer_id = int(answer_id)
+        except (ValueError, TypeError):
+            return None
+        if answer_id not in key['answer_ids']:
+            return None
+        is_correct = answer_id in key['correct_answer_ids']
+        student_answer = StudentAnswer(
+            question_id=question_id,
+            selected_answer_id=answer_id,
+            is_correct=is_correct,
+            points_earned=key['points'] if is_correct else 0,
+        )
+        return student_answer, {
+            'question_id': question_id,
+            'is_correct': is_correct,
+            'correct_answer_id': None if is_correct else key['correct_answer_id'],
+            'correct_answer_text': '' if is_correct else key['correct_answer_text'],
+            'explanation': key['explanation'],
+        }
+
+    if text_answer and key['question_type'] == 'short_answer':
+        student_answer = StudentAnswer(
+            question_id=question_id,
+            text_answer=text_answer,
+            is_correct=True,
+            points_earned=key['points'],
+        )
+        return student_answer, {'question_id': question_id, 'is_correct': True, 'explanation': key['explanation']}
+
+    return None
+
+
 @login_required
 @require_http_methods(["POST"])
 def submit_topic_answer(request):
     """AJAX endpoint to save a student's answer for a topic question.
-    Returns correctness info so the client never needs to know answers upfront."""
+    Returns correctness info so the client never needs to know answers upfront.
+    Answers are graded from the cached answer keys, so a question from the
+    student's current quiz costs a single write."""
     data = json.loads(request.body)
-    question_id = data.get('question_id')
     answer_id = data.get('answer_id')
     text_answer = data.get('text_answer')
     attempt_id = data.get('attempt_id', '')
-
     try:
-        question = Question.objects.get(id=question_id)
+        question_id = int(data.get('question_id'))
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid question or answer'}, status=400)
 
-        # Verify the student has access to this question's level
-        allowed = student_allowed_levels(request.user)
-        if allowed is not None and not allowed.filter(pk=question.level.pk).exists():
-            return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    keys = answer_keys.get_answer_keys([question_id])
+    if not keys:
+        return JsonResponse({'success': False, 'error': 'Invalid question or answer'}, status=400)
+
+    # Verify the student has access to this question's level
+    if not _can_answer(request, keys):
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
 
+    graded = _grade_topic_answer(question_id, keys[question_id], answer_id, text_answer)
+    if graded is None:
         if answer_id:
-            answer = Answer.objects.get(id=answer_id, question=question)
-            StudentAnswer.objects.update_or_create(
-                student=request.user,
-                question=question,
-                defaults={
-                    'selected_answer': answer,
-                    'is_correct': answer.is_correct,
-                    'points_earned': question.points if answer.is_correct else 0,
-                    'session_id': attempt_id
-                }
-            )
-            # Find the correct answer text to return to client
-            correct_answer_text = ''
-            if not answer.is_correct:
-                correct_obj = question.answers.filter(is_correct=True).first()
-                if correct_obj:
-                    correct_answer_text = correct_obj.answer_text
-
-            return JsonResponse({
-                'success': True,
-                'is_correct': answer.is_correct,
-                'correct_answer_id': question.answers.filter(is_correct=True).first().id if not answer.is_correct else None,
-                'correct_answer_text': correct_answer_text,
-                'explanation': question.explanation or '',
-            })
+            return JsonResponse({'success': False, 'error': 'Invalid question or answer'}, status=400)
+        return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
 
-        elif text_answer and question.question_type == 'short_answer':
-            StudentAnswer.objects.update_or_create(
-                student=request.user,
-                question=question,
-                defaults={
-                    'text_answer': text_answer,
-                    'is_correct': True,
-                    'points_earned': question.points,
-                    'session_id': attempt_id
-                }
-            )
-            return JsonResponse({'success': True, 'is_correct': True, 'explanation': question.explanation or ''})
+    student_answer, result = graded
+    from maths.utils import save_student_answers
+    save_student_answers(request.user, attempt_id, [student_answer])
+    return JsonResponse({'success': True, **result})
+
+
+# Most answers a single batch may carry (the longest quiz has 25 questions)
+MAX_ANSWER_BATCH = 100
 
-    except (Question.DoesNotExist, Answer.DoesNotExist):
+
+@login_required
+@require_http_methods(["POST"])
+def submit_topic_answers(request):
+    """AJAX endpoint to grade a batch of a student's topic answers.
+    Body: {"attempt_id": ..., "answers": [{"question_id", "answer_id" or
+    "text_answer"}, ...], "save": true}. Every answer is graded from the
+    cached answer keys and returned in order; with save (the default) the
+    batch is also stored in one transaction, so the quiz can check answers
+    one at a time and save them in batches."""
+    try:
+        data = json.loads(request.body)
+        items = data.get('answers') or []
+        question_ids = {int(item['question_id']) for item in items}
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid data'}, status=400)
+    attempt_id = data.get('attempt_id', '')
+    save = data.get('save', True)
+    if not items:
+        return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
+    if len(items) > MAX_ANSWER_BATCH:
+        return JsonResponse({'success': False, 'error': 'Too many answers'}, status=400)
+
+    keys = answer_keys.get_answer_keys(question_ids)
+    if len(keys) != len(question_ids):
         return JsonResponse({'success': False, 'error': 'Invalid question or answer'}, status=400)
 
-    return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
+    # Verify the student has access to every level in the batch
+    if not _can_answer(request, keys):
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+
+    results = []
+    graded = {}  # question_id -> unsaved StudentAnswer; a repeated question keeps its last answer
+    for item in items:
+        question_id = int(item['question_id'])
+        answer_id = item.get('answer_id')
+        result = _grade_topic_answer(question_id, keys[question_id], answer_id, item.get('text_answer'))
+        if result is None:
+            if answer_id:
+                return JsonResponse({'success': False, 'error': 'Invalid question or answer'}, status=400)
+            return JsonResponse({'success': False, 'error': 'Missing data'}, status=400)
+        graded[question_id] = result[0]
+        results.append(result[1])
+
+    if save:
+        from maths.utils import save_student_answers
+        save_student_answers(request.user, attempt_id, list(graded.values()))
+
+    return JsonResponse({'success': True, 'saved': bool(save), 'results': results})
 
 
 @login_required
@@ -2400,11 +1591,6 @@ def topic_questions(request, level_number, topic_name):
     if not topic_obj:
         topic_obj = Topic.objects.create(name=topic_name)
 
-    all_questions_query = Question.objects.filter(
-        level=level,
-        topic=topic_obj
-    ).prefetch_related('answers')
-
     question_limit = YEAR_QUESTION_COUNTS.get(level.level_number, 10)
 
     # Times table topics always have exactly 12 questions — serve them all
@@ -2450,43 +1636,35 @@ def topic_questions(request, level_number, topic_name):
 
         student_answers.update(time_taken_seconds=total_time_seconds)
 
-        if not request.user.is_teacher:
-            update_time_log_from_activities(request.user)
-
-        def update_stats_async():
-            try:
-                update_topic_statistics(level_num=level.level_number, topic_name=topic_obj.name)
-            except Exception:
-                pass
-
-        thread = threading.Thread(target=update_stats_async)
-        thread.daemon = True
-        thread.start()
+        # Append this attempt's answers (now carrying the attempt time) to the answer log
+        from maths.utils import save_attempt_answers
+        save_attempt_answers(request.user, attempt_id)
 
         percentage = (total_score / total_points) if total_points else 0
         final_points = (percentage * 100 * 60) / total_time_seconds if total_time_seconds else 0
         final_points = round(final_points, 2)
 
+        # Add the attempt to the student's activity and time log once; a
+        # reload after the session keys are cleared has no attempt id
+        if attempt_id and not request.user.is_teacher:
+            from maths.utils import record_activity
+            record_activity(request.user, total_time_seconds, final_points)
+
         from maths.utils import save_student_final_answer
-        save_student_final_answer(
+        previous_best_points = save_student_final_answer(
             student=request.user,
             session_id=attempt_id,
             topic=topic_obj,
             level=level,
-            points_earned=final_points
+            points_earned=final_points,
+            time_taken_seconds=total_time_seconds
         )
 
-        current_attempt_id = attempt_id
-
         _clear_session_keys(
             request.session,
             timer_session_key, questions_session_key, 'current_attempt_id',
         )
 
-        previous_best_points = _calculate_previous_best_points(
-            request.user, level, topic_obj, current_attempt_id
-        )
-
         beat_record = previous_best_points is not None and final_points > previous_best_points
         is_first_attempt = previous_best_points is None
 
@@ -2514,50 +1692,30 @@ def topic_questions(request, level_number, topic_name):
     request.session[timer_session_key] = time.time()
     request.session['current_attempt_id'] = str(uuid.uuid4())
 
-    all_questions_list = []
-    for q in all_questions_query:
-        answer_count = q.answers.count()
-        correct_count = q.answers.filter(is_correct=True).count()
-        wrong_count = q.answers.filter(is_correct=False).count()
-        if answer_count == 0:
-            continue
-        if correct_count == 0:
-            continue
-        if q.question_type in ['multiple_choice', 'true_false'] and wrong_count == 0:
-            continue
-        all_questions_list.append(q)
-
-    if len(all_questions_list) > question_limit:
-        selected_questions = select_questions_stratified(all_questions_list, question_limit)
+    # Choose from the cached pool of valid questions. The answer key version
+    # is read first, so keys from a pool that predates an edit aren't cached
+    answer_keys_version = answer_keys.get_version()
+    pool = question_pools.get_pool(level.id, topic_obj.id)
+    if len(pool) > question_limit:
+        selected_questions = select_questions_stratified(pool, question_limit)
     else:
-        selected_questions = all_questions_list
+        selected_questions = list(pool)
 
     random.shuffle(selected_questions)
-    request.session[questions_session_key] = [q.id for q in selected_questions]
-
-    # Serialize all questions and their answers as JSON for client-side rendering
-    questions_json_data = []
-    for q in selected_questions:
-        answers_list = list(q.answers.all())
-        random.shuffle(answers_list)
-        answers_data = [{
-            'id': a.id,
-            'answer_text': a.answer_text,
-        } for a in answers_list]
-        questions_json_data.append({
-            'id': q.id,
-            'question_text': q.question_text,
-            'question_type': q.question_type,
-            'image_url': q.image.url if q.image else None,
-            'points': q.points,
-            'answers': answers_data,
-        })
+    request.session[questions_session_key] = [question_id for question_id, *_ in selected_questions]
+
+    # Assemble the client-side payload from cached per-question JSON; only
+    # questions edited since they were last served are loaded and serialized
+    questions_json = question_payloads.get_quiz_json(
+        [(question_id, updated_at) for question_id, updated_at, *_ in selected_questions],
+        answer_keys_version,
+    )
 
     return render(request, "maths/topic_quiz.html", {
         "level": level,
         "topic": topic_obj,
         "total_questions": len(selected_questions),
-        "questions_json": json.dumps(questions_json_data),
+        "questions_json": questions_json,
         "attempt_id": request.session.get('current_attempt_id', ''),
         "prefetched": True,
     })